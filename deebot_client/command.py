@@ -5,28 +5,51 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 import asyncio
 from dataclasses import dataclass, field
+from enum import StrEnum
 from typing import TYPE_CHECKING, Any, final
 
 from deebot_client.events import AvailabilityEvent
 from deebot_client.exceptions import (
     ApiTimeoutError,
     DeebotError,
+    MqttError,
 )
 
 from .const import PATH_API_IOT_DEVMANAGER, REQUEST_HEADERS, DataType
+from .event_bus import EventSource, event_source
 from .logging_filter import get_logger
 from .message import HandlingResult, HandlingState, Message
 
 if TYPE_CHECKING:
+    from collections.abc import Hashable
     from types import MappingProxyType
 
     from .authentication import Authenticator
     from .event_bus import EventBus
     from .models import ApiDeviceInfo
+    from .mqtt_client import MqttClient
 
 _LOGGER = get_logger(__name__)
 
 
+def _freeze(value: Any) -> Any:
+    """Convert value recursively into a hashable representation."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(val)) for key, val in value.items()))
+    if isinstance(value, list | tuple):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+class CommandTransport(StrEnum):
+    """Transport used to send commands to the device."""
+
+    # Rest call, which is relayed by the cloud to the device
+    REST = "rest"
+    # P2p request over the mqtt connection; falls back to rest if not possible
+    MQTT_P2P = "mqtt_p2p"
+
+
 @dataclass(frozen=True)
 class CommandResult(HandlingResult):
     """Command result object."""
@@ -92,11 +115,16 @@ class Command(ABC):
         authenticator: Authenticator,
         device_info: ApiDeviceInfo,
         event_bus: EventBus,
+        *,
+        mqtt_client: MqttClient | None = None,
     ) -> DeviceCommandResult:
-        """Execute command."""
+        """Execute command.
+
+        If a mqtt client is given, the command is sent as p2p request if possible.
+        """
         try:
             result, response = await self._execute(
-                authenticator, device_info, event_bus
+                authenticator, device_info, event_bus, mqtt_client
             )
             if result.state == HandlingState.SUCCESS:
                 # Execute command which are requested by the handler
@@ -104,7 +132,10 @@ class Command(ABC):
                     for requested_command in result.requested_commands:
                         tg.create_task(
                             requested_command.execute(
-                                authenticator, device_info, event_bus
+                                authenticator,
+                                device_info,
+                                event_bus,
+                                mqtt_client=mqtt_client,
                             )
                         )
 
@@ -125,18 +156,22 @@ class Command(ABC):
         authenticator: Authenticator,
         device_info: ApiDeviceInfo,
         event_bus: EventBus,
+        mqtt_client: MqttClient | None = None,
     ) -> tuple[CommandResult, dict[str, Any]]:
         """Execute command."""
         try:
-            response = await self._execute_api_request(authenticator, device_info)
-        except ApiTimeoutError:
+            response, source = await self._execute_request(
+                authenticator, device_info, mqtt_client
+            )
+        except (ApiTimeoutError, TimeoutError):
             _LOGGER.warning(
                 "Could not execute command %s: Timeout reached",
                 self.name,
             )
             return CommandResult(HandlingState.ERROR), {}
 
-        result = self.__handle_response(event_bus, response)
+        with event_source(source):
+            result = self.__handle_response(event_bus, response)
         if result.state == HandlingState.ANALYSE:
             _LOGGER.debug(
                 "ANALYSE: Could not handle command: %s with %s", self.name, response
@@ -153,6 +188,39 @@ class Command(ABC):
             _LOGGER.warning("Could not parse %s: %s", self.name, response)
         return result, response
 
+    async def _execute_request(
+        self,
+        authenticator: Authenticator,
+        device_info: ApiDeviceInfo,
+        mqtt_client: MqttClient | None,
+    ) -> tuple[dict[str, Any], EventSource]:
+        # Only json p2p responses are subscribed
+        if (
+            mqtt_client is not None
+            and self._targets_bot
+            and self.data_type == DataType.JSON
+        ):
+            try:
+                response = await mqtt_client.execute_p2p_command(
+                    device_info, self.name, self._get_payload()
+                )
+            except MqttError:
+                # The request was not published, so it is safe to send it again.
+                # A timeout is not retried, as the device may have executed the command
+                _LOGGER.debug(
+                    "Could not execute command %s over mqtt; Falling back to rest",
+                    self.name,
+                    exc_info=True,
+                )
+            else:
+                # Same format as the rest response
+                return {"ret": "ok", "resp": response}, EventSource.P2P
+
+        return (
+            await self._execute_api_request(authenticator, device_info),
+            EventSource.REST,
+        )
+
     async def _execute_api_request(
         self, authenticator: Authenticator, device_info: ApiDeviceInfo
     ) -> dict[str, Any]:
@@ -228,7 +296,17 @@ class Command(ABC):
         return False
 
     def __hash__(self) -> int:
-        return hash(self.name) + hash(self._args)
+        return hash((self.name, _freeze(self._args)))
+
+    def get_in_flight_key(self) -> Hashable | None:
+        """Return key to share the execution with identical commands in flight.
+
+        Only get commands are side-effect free; all other commands return None and
+        are always executed.
+        """
+        if not self.name.lower().startswith("get"):
+            return None
+        return (self.name, _freeze(self._args))
 
 
 class CommandWithMessageHandling(Command, Message, ABC):
@@ -15,6 +15,7 @@ if TYPE_CHECKING:
     from deebot_client.authentication import Authenticator
     from deebot_client.command import CommandResult
     from deebot_client.event_bus import EventBus
+    from deebot_client.mqtt_client import MqttClient
 
 _LOGGER = get_logger(__name__)
 
@@ -32,6 +33,7 @@ class Clean(ExecuteCommand):
         authenticator: Authenticator,
         device_info: ApiDeviceInfo,
         event_bus: EventBus,
+        mqtt_client: MqttClient | None = None,
     ) -> tuple[CommandResult, dict[str, Any]]:
         """Execute command."""
         state = event_bus.get_last_event(StateEvent)
@@ -47,7 +49,9 @@ class Clean(ExecuteCommand):
             ):
                 self._args = self._get_args(CleanAction.RESUME)
 
-        return await super()._execute(authenticator, device_info, event_bus)
+        return await super()._execute(
+            authenticator, device_info, event_bus, mqtt_client
+        )
 
     def _get_args(self, action: CleanAction) -> dict[str, Any]:
         args = {"act": action.value}
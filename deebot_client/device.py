@@ -13,7 +13,7 @@ from deebot_client.events.network import NetworkInfoEvent
 from deebot_client.mqtt_client import MqttClient, SubscriberInfo
 from deebot_client.util import cancel
 
-from .command import Command
+from .command import Command, CommandTransport
 from .event_bus import EventBus
 from .events import (
     AvailabilityEvent,
@@ -32,8 +32,11 @@ from .messages import get_message
 from .models import DeviceInfo, State
 
 if TYPE_CHECKING:
+    from collections.abc import Hashable
+
     from .authentication import Authenticator
     from .command import DeviceCommandResult
+    from .map_cache import MapPieceCache
 
 _LOGGER = get_logger(__name__)
 _AVAILABLE_CHECK_INTERVAL = 60
@@ -49,13 +52,21 @@ class Device:
         self,
         device_info: DeviceInfo,
         authenticator: Authenticator,
+        *,
+        map_piece_cache: MapPieceCache | None = None,
+        command_transport: CommandTransport = CommandTransport.REST,
     ) -> None:
         self.device_info: Final = device_info.api
         self._static_device_info = device_info.static
         self.capabilities: Final = self._static_device_info.capabilities
         self._authenticator = authenticator
+        self._command_transport = command_transport
+        # Mqtt client used to send commands as p2p requests
+        self._p2p_client: MqttClient | None = None
 
         self._semaphore = asyncio.Semaphore(3)
+        # Identical get commands in flight are executed only once
+        self._commands_in_flight: dict[Hashable, asyncio.Task[DeviceCommandResult]] = {}
         self._state: StateEvent | None = None
         self._last_time_available: datetime = datetime.now()
         self._available_task: asyncio.Task[Any] | None = None
@@ -67,7 +78,9 @@ class Device:
             self.execute_command, self.capabilities.get_refresh_commands
         )
 
-        self.map: Final[Map] = Map(self.execute_command, self.events)
+        self.map: Final[Map] = Map(
+            self.execute_command, self.events, map_piece_cache=map_piece_cache
+        )
 
         async def on_pos(event: PositionsEvent) -> None:
             if self._state == StateEvent(State.DOCKED):
@@ -126,6 +139,8 @@ class Device:
             self._unsubscribe = await client.subscribe(
                 SubscriberInfo(self.device_info, self.events, self._handle_message)
             )
+            if self._command_transport == CommandTransport.MQTT_P2P:
+                self._p2p_client = client
 
         if self._available_task is None or self._available_task.done():
             self._available_task = asyncio.create_task(self._available_task_worker())
@@ -135,11 +150,13 @@ class Device:
         if self._unsubscribe:
             self._unsubscribe()
             self._unsubscribe = None
+            self._p2p_client = None
 
         if self._available_task and self._available_task.cancel():
             with suppress(asyncio.CancelledError):
                 await self._available_task
 
+        await cancel(set(self._commands_in_flight.values()))
         await self.events.teardown()
         await self.map.teardown()
 
@@ -169,10 +186,36 @@ class Device:
         self,
         command: Command,
     ) -> DeviceCommandResult:
-        """Execute given command."""
+        """Execute given command or wait for the identical command in flight."""
+        if (key := command.get_in_flight_key()) is None:
+            return await self._execute_command_in_flight(command)
+
+        # The key is computed once, as commands can change their args while executing
+        if (task := self._commands_in_flight.get(key)) is None:
+            task = asyncio.create_task(self._execute_command_in_flight(command))
+            self._commands_in_flight[key] = task
+
+            def on_done(task: asyncio.Task[DeviceCommandResult]) -> None:
+                if self._commands_in_flight.get(key) is task:
+                    del self._commands_in_flight[key]
+
+            task.add_done_callback(on_done)
+        else:
+            _LOGGER.debug("Command %s is already in flight", command.name)
+
+        # Shield the shared execution from cancellation of a single waiter
+        return await asyncio.shield(task)
+
+    async def _execute_command_in_flight(
+        self,
+        command: Command,
+    ) -> DeviceCommandResult:
         async with self._semaphore:
             result = await command.execute(
-                self._authenticator, self.device_info, self.events
+                self._authenticator,
+                self.device_info,
+                self.events,
+                mqtt_client=self._p2p_client,
             )
             if result.device_reached:
                 self._set_available(available=True)
@@ -3,24 +3,337 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import UTC, datetime, timedelta
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from enum import StrEnum, unique
+import inspect
+from math import inf
+import random
 import threading
-from typing import TYPE_CHECKING, Any, Final, Generic, TypeVar
-
-from .events import AvailabilityEvent, Event, StateEvent
+import time
+from typing import TYPE_CHECKING, Any, Final, Generic, Self, TypeVar
+from weakref import WeakKeyDictionary
+
+from .event_history import EventHistory
+from .events import (
+    AvailabilityEvent,
+    BatteryEvent,
+    CachedMapInfoEvent,
+    CleanLogEvent,
+    ErrorEvent,
+    Event,
+    MajorMapEvent,
+    MapTraceEvent,
+    PositionsEvent,
+    StateEvent,
+    StatsEvent,
+    TotalStatsEvent,
+)
 from .logging_filter import get_logger
+from .metrics import Counter, Duration, EventMetrics, MetricsSnapshot
 from .models import State
 from .util import cancel, create_task
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Coroutine
+    from collections.abc import (
+        Awaitable,
+        Callable,
+        Coroutine,
+        Hashable,
+        Iterator,
+        Mapping,
+        Sequence,
+    )
+    from types import TracebackType
 
     from .command import Command
     from .device import DeviceCommandExecute
+    from .metrics import MetricsSink
 
 _LOGGER = get_logger(__name__)
 
 T = TypeVar("T", bound=Event)
+_UNSET: Final = object()
+
+# Refresh after coming back online is done in stages ordered by priority.
+# Event types not listed here have the default priority
+_RECOVERY_REFRESH_PRIORITIES: Final[dict[type[Event], int]] = {
+    StateEvent: 0,
+    BatteryEvent: 1,
+    ErrorEvent: 1,
+    CachedMapInfoEvent: 3,
+    MajorMapEvent: 3,
+    MapTraceEvent: 3,
+    PositionsEvent: 3,
+    CleanLogEvent: 3,
+    StatsEvent: 3,
+    TotalStatsEvent: 3,
+}
+_RECOVERY_REFRESH_DEFAULT_PRIORITY: Final = 2
+# Random delay before the refresh starts, so recovering devices don't refresh at once
+_RECOVERY_REFRESH_MAX_JITTER = 3.0
+# Maximum concurrent recovery refreshes over all event buses in the process
+_MAX_CONCURRENT_RECOVERY_REFRESHES = 4
+_recovery_refresh_semaphores: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = WeakKeyDictionary()
+
+
+def _get_recovery_refresh_semaphore() -> asyncio.Semaphore:
+    """Return the process wide recovery refresh semaphore of the running loop."""
+    loop = asyncio.get_running_loop()
+    if (semaphore := _recovery_refresh_semaphores.get(loop)) is None:
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_RECOVERY_REFRESHES)
+        _recovery_refresh_semaphores[loop] = semaphore
+    return semaphore
+
+
+@unique
+class DebounceMode(StrEnum):
+    """Debounce mode."""
+
+    # Notify directly and drop all events during the debounce time
+    LEADING = "leading"
+    # Notify with the latest event after no new event was notified for the debounce time
+    TRAILING = "trailing"
+    # Notify directly if idle and otherwise like trailing
+    BOTH = "both"
+
+
+@unique
+class EventSource(StrEnum):
+    """Source of an event."""
+
+    MQTT = "mqtt"
+    P2P = "p2p"
+    REST = "rest"
+    UNKNOWN = "unknown"
+
+
+_event_source: ContextVar[EventSource] = ContextVar(
+    "event_source", default=EventSource.UNKNOWN
+)
+
+
+@contextmanager
+def event_source(source: EventSource) -> Iterator[None]:
+    """Set the source of all events notified in this context."""
+    token = _event_source.set(source)
+    try:
+        yield
+    finally:
+        _event_source.reset(token)
+
+
+@dataclass(frozen=True, slots=True)
+class EventMetadata:
+    """Metadata of the last received event."""
+
+    # Receive time as time.monotonic()
+    received_monotonic: float
+    # Receive time as time.time()
+    received_timestamp: float
+    source: EventSource
+
+    @property
+    def received_at(self) -> datetime:
+        """Return receive time as wall clock time."""
+        return datetime.fromtimestamp(self.received_timestamp, UTC)
+
+    @property
+    def age(self) -> float:
+        """Return seconds since the event was received."""
+        return time.monotonic() - self.received_monotonic
+
+
+@unique
+class StreamOverflow(StrEnum):
+    """Behaviour of an event stream, when its buffer is full."""
+
+    # Drop the oldest buffered event
+    DROP_OLDEST = "drop_oldest"
+    # Replace the newest buffered event, so the latest value is always available
+    COALESCE = "coalesce"
+    # Wait until there is space in the buffer.
+    # In the meantime up to maxsize events are held by the delivery task of the stream,
+    # afterwards the oldest held event is dropped
+    BLOCK = "block"
+
+
+class EventStream(Generic[T]):
+    """Async iterator over events with a bounded buffer."""
+
+    def __init__(self, maxsize: int, overflow: StreamOverflow) -> None:
+        if maxsize <= 0:
+            msg = "maxsize must be greater than 0"
+            raise ValueError(msg)
+
+        self._maxsize: Final = maxsize
+        self._overflow: Final = overflow
+        self._buffer: Final[deque[T]] = deque()
+        # Events waiting for space in the buffer (only used by BLOCK)
+        self._pending: Final[deque[T]] = deque()
+        self._delivery_task: asyncio.Task[None] | None = None
+        self._not_empty: Final = asyncio.Event()
+        self._not_full: Final = asyncio.Event()
+        self._closed = False
+        self._close_callbacks: Final[list[Callable[[], None]]] = []
+        self.dropped: int = 0
+
+    @property
+    def closed(self) -> bool:
+        """Return True, if the stream is closed."""
+        return self._closed
+
+    def add_close_callback(self, callback: Callable[[], None]) -> None:
+        """Add callback, which is called when the stream is closed."""
+        self._close_callbacks.append(callback)
+
+    def put_nowait(self, event: T) -> None:
+        """Put event into the buffer and handle a full buffer as defined by overflow."""
+        if self._overflow == StreamOverflow.BLOCK:
+            self._put_pending(event)
+            return
+
+        self._put_buffer(event)
+
+    def _put_pending(self, event: T) -> None:
+        if self._delivery_task is None and len(self._buffer) < self._maxsize:
+            self._buffer.append(event)
+            self._not_empty.set()
+            return
+
+        if len(self._pending) >= self._maxsize:
+            self.dropped += 1
+            self._pending.popleft()
+        self._pending.append(event)
+        if self._delivery_task is None:
+            self._delivery_task = asyncio.create_task(self._deliver_pending())
+
+    async def _deliver_pending(self) -> None:
+        try:
+            while self._pending and not self._closed:
+                await self.put(self._pending.popleft())
+        finally:
+            self._delivery_task = None
+
+    def _put_buffer(self, event: T) -> None:
+        if len(self._buffer) >= self._maxsize:
+            self.dropped += 1
+            if self._overflow == StreamOverflow.COALESCE:
+                self._buffer.pop()
+            else:
+                self._buffer.popleft()
+        self._buffer.append(event)
+        self._not_empty.set()
+
+    async def put(self, event: T) -> None:
+        """Put event into the buffer and wait for space if the buffer is full."""
+        while len(self._buffer) >= self._maxsize and not self._closed:
+            self._not_full.clear()
+            await self._not_full.wait()
+        if not self._closed:
+            self._put_buffer(event)
+
+    def close(self) -> None:
+        """Close stream and unsubscribe from the event bus."""
+        if self._closed:
+            return
+
+        self._closed = True
+        for callback in self._close_callbacks:
+            callback()
+        self._close_callbacks.clear()
+        self._pending.clear()
+        # wake up waiting consumer and producer
+        self._not_empty.set()
+        self._not_full.set()
+
+    def __aiter__(self) -> Self:
+        return self
+
+    async def __anext__(self) -> T:
+        while not self._buffer:
+            if self._closed:
+                raise StopAsyncIteration
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        event = self._buffer.popleft()
+        self._not_full.set()
+        return event
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class _Debouncer:
+    """Debouncer, which handles all pending notifications with a single timer.
+
+    The timer is not moved, when a pending notification is postponed.
+    It fires at the earlier deadline and is set again to the next pending deadline.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[object, tuple[float, Callable[[], None]]] = {}
+        self._handle: asyncio.TimerHandle | None = None
+        self._handle_when: float = inf
+
+    def schedule(self, key: object, when: float, callback: Callable[[], None]) -> None:
+        """Schedule callback at the given loop time and replace a pending one."""
+        self._pending[key] = (when, callback)
+        if when < self._handle_when:
+            self._set_timer(when)
+
+    def discard(self, key: object) -> None:
+        """Discard pending callback of the given key."""
+        self._pending.pop(key, None)
+
+    def cancel(self) -> None:
+        """Cancel timer and discard all pending callbacks."""
+        self._pending.clear()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        self._handle_when = inf
+
+    def _set_timer(self, when: float) -> None:
+        if self._handle:
+            self._handle.cancel()
+        self._handle = asyncio.get_running_loop().call_at(when, self._on_timer)
+        self._handle_when = when
+
+    def _on_timer(self) -> None:
+        # Everything scheduled up to the timer deadline is due
+        due_until = self._handle_when
+        self._handle = None
+        self._handle_when = inf
+
+        try:
+            for key in [
+                key for key, (when, _) in self._pending.items() if when <= due_until
+            ]:
+                # A previous callback may have discarded this entry
+                if (entry := self._pending.pop(key, None)) is None:
+                    continue
+                try:
+                    entry[1]()
+                except Exception:
+                    _LOGGER.exception("Error in debounced callback")
+        finally:
+            if self._pending:
+                self._set_timer(min(when for when, _ in self._pending.values()))
 
 
 class _OnSubscriptionCallback:
@@ -43,19 +356,57 @@ class _OnSubscriptionCallback:
             self._unsub = None
 
 
+class _Subscriber(Generic[T]):
+    """Subscriber, which holds the callback and how it should be called."""
+
+    __slots__ = (
+        "callback",
+        "is_async",
+        "key",
+        "last_call_time",
+        "last_key",
+        "min_interval",
+        "ordered",
+        "predicate",
+    )
+
+    def __init__(
+        self,
+        callback: Callable[[T], Coroutine[Any, Any, None] | None],
+        *,
+        ordered: bool,
+        min_interval: float,
+        key: Callable[[T], Hashable] | None,
+        predicate: Callable[[T], bool] | None,
+    ) -> None:
+        self.callback: Final = callback
+        self.is_async: Final = inspect.iscoroutinefunction(callback)
+        self.ordered: Final = ordered and self.is_async
+        self.min_interval: Final = min_interval
+        self.key: Final = key
+        self.predicate: Final = predicate
+        self.last_key: Hashable = _UNSET
+        self.last_call_time: float = -inf
+
+
 class _EventProcessingData(Generic[T]):
     """Data class, which holds all needed data per EventDto."""
 
-    def __init__(self, refresh_commands: list[Command]) -> None:
+    def __init__(self, event_type: type[T], refresh_commands: list[Command]) -> None:
+        self.event_type: Final = event_type
         self.refresh_commands: Final = refresh_commands
+        self.metrics: Final = EventMetrics()
 
-        self.subscriber_callbacks: Final[
-            list[Callable[[T], Coroutine[Any, Any, None]]]
-        ] = []
+        self.subscribers: Final[list[_Subscriber[T]]] = []
+        # Pending calls of ordered subscribers, which are awaited by one worker
+        self.ordered_calls: Final[deque[tuple[_Subscriber[T], T]]] = deque()
+        self.ordered_worker: asyncio.Task[None] | None = None
         self.semaphore: Final = asyncio.Semaphore(1)
         self.last_event: T | None = None
-        self.last_event_time: datetime = datetime(1, 1, 1, 1, 1, 1, tzinfo=UTC)
-        self.notify_handle: asyncio.TimerHandle | None = None
+        self.last_event_metadata: EventMetadata | None = None
+        self.history: EventHistory[T] | None = None
+        # Loop time of the last debounced notification
+        self.last_debounced_time: float = -inf
         self.on_subscription_callbacks: Final[list[_OnSubscriptionCallback]] = []
 
 
@@ -66,10 +417,17 @@ class EventBus:
         self,
         execute_command: DeviceCommandExecute,
         get_refresh_commands: Callable[[type[Event]], list[Command]],
+        *,
+        metrics_sink: MetricsSink | None = None,
     ) -> None:
         self._event_processing_dict: dict[type[Event], _EventProcessingData[Any]] = {}
         self._lock = threading.Lock()
         self._tasks: set[asyncio.Future[Any]] = set()
+        self._debouncer = _Debouncer()
+        self._streams: set[EventStream[Any]] = set()
+        self._listeners: list[Callable[[Event], None]] = []
+        self._recovery_refresh_task: asyncio.Task[None] | None = None
+        self._metrics_sink = metrics_sink
 
         self._execute_command: Final = execute_command
         self._get_refresh_commands = get_refresh_commands
@@ -77,7 +435,7 @@ class EventBus:
     def has_subscribers(self, event: type[T]) -> bool:
         """Return True, if emitter has subscribers."""
         return (
-            len(self._event_processing_dict[event].subscriber_callbacks) > 0
+            len(self._event_processing_dict[event].subscribers) > 0
             if event in self._event_processing_dict
             else False
         )
@@ -85,23 +443,56 @@ class EventBus:
     def subscribe(
         self,
         event_type: type[T],
-        callback: Callable[[T], Coroutine[Any, Any, None]],
+        callback: Callable[[T], Coroutine[Any, Any, None] | None],
+        *,
+        ordered: bool = False,
+        max_rate: float | None = None,
+        min_interval: float = 0,
+        key: Callable[[T], Hashable] | None = None,
+        predicate: Callable[[T], bool] | None = None,
     ) -> Callable[[], None]:
-        """Subscribe to event."""
+        """Subscribe to event.
+
+        Synchronous callbacks are called inline. Async callbacks are executed as task
+        or, if ordered is set, awaited one after another by a worker per event type.
+
+        The following filters are applied before the callback is called:
+        - predicate: only events, for which the predicate returns True
+        - key: only events, whose key differs from the key of the last passed event
+        - max_rate/min_interval: at most max_rate calls per second and
+          at least min_interval seconds between two calls.
+          Events in between are delayed and only the latest one is passed.
+        """
+        if max_rate is not None:
+            if max_rate <= 0:
+                msg = "max_rate must be greater than 0"
+                raise ValueError(msg)
+            min_interval = max(min_interval, 1 / max_rate)
+
         event_processing_data = self._get_or_create_event_processing_data(event_type)
+        subscriber = _Subscriber(
+            callback,
+            ordered=ordered,
+            min_interval=min_interval,
+            key=key,
+            predicate=predicate,
+        )
 
         def unsubscribe() -> None:
-            event_processing_data.subscriber_callbacks.remove(callback)
-            if not event_processing_data.subscriber_callbacks:
+            event_processing_data.subscribers.remove(subscriber)
+            self._debouncer.discard(subscriber)
+            if not event_processing_data.subscribers:
                 for _callback in event_processing_data.on_subscription_callbacks:
                     _callback.unsubscribe()
 
-        event_processing_data.subscriber_callbacks.append(callback)
+        event_processing_data.subscribers.append(subscriber)
 
         if event_processing_data.last_event:
             # Notify subscriber directly with the last event
-            create_task(self._tasks, callback(event_processing_data.last_event))
-        elif len(event_processing_data.subscriber_callbacks) == 1:
+            self._call_subscriber(
+                event_processing_data, subscriber, event_processing_data.last_event
+            )
+        elif len(event_processing_data.subscribers) == 1:
             # first subscriber therefore do refresh
             self.request_refresh(event_type)
             _LOGGER.debug("Calling on_first_subscription callbacks for %s", event_type)
@@ -110,72 +501,337 @@ class EventBus:
 
         return unsubscribe
 
-    def notify(self, event: T, *, debounce_time: float = 0) -> None:
+    def notify(
+        self,
+        event: T,
+        *,
+        debounce_time: float = 0,
+        debounce_mode: DebounceMode = DebounceMode.BOTH,
+    ) -> None:
         """Notify subscriber with given event representation."""
-        event_processing_data = self._get_or_create_event_processing_data(type(event))
+        event_type = type(event)
+        event_processing_data = self._get_or_create_event_processing_data(event_type)
+        self._increment(event_processing_data, Counter.NOTIFIED)
+        source = _event_source.get()
 
+        if debounce_time <= 0:
+            self._debouncer.discard(event_type)
+            self._notify(event_processing_data, event, source)
+            return
+
+        now = asyncio.get_running_loop().time()
         if (
-            handle := event_processing_data.notify_handle
-        ) is not None and not handle.cancelled():
-            handle.cancel()
+            debounce_mode != DebounceMode.TRAILING
+            and now - event_processing_data.last_debounced_time > debounce_time
+        ):
+            self._debouncer.discard(event_type)
+            event_processing_data.last_debounced_time = now
+            self._notify(event_processing_data, event, source)
+        else:
+            self._increment(event_processing_data, Counter.DEBOUNCED)
+            if debounce_mode == DebounceMode.LEADING:
+                return
 
-        def _notify(event: T) -> None:
-            event_processing_data.last_event_time = datetime.now(UTC)
-            event_processing_data.notify_handle = None
+            def notify_debounced() -> None:
+                event_processing_data.last_debounced_time = (
+                    asyncio.get_running_loop().time()
+                )
+                self._notify(event_processing_data, event, source)
 
-            if (
-                isinstance(event, StateEvent)
-                and event.state == State.IDLE
-                and event_processing_data.last_event
-                and event_processing_data.last_event.state == State.DOCKED  # type: ignore[attr-defined]
-            ):
-                # TODO distinguish better between docked and idle and outside event bus. # pylint: disable=fixme
-                # Problem getCleanInfo will return state=idle, when bot is charging
-                event = StateEvent(State.DOCKED)  # type: ignore[assignment]
-            elif (
-                isinstance(event, AvailabilityEvent)
-                and event.available
-                and event_processing_data.last_event
-                and not event_processing_data.last_event.available  # type: ignore[attr-defined]
-            ):
-                # unavailable -> available: refresh everything
-                for event_type in self._event_processing_dict:
-                    if event_type != AvailabilityEvent:
-                        self.request_refresh(event_type)
+            self._debouncer.schedule(event_type, now + debounce_time, notify_debounced)
 
-            if event == event_processing_data.last_event:
-                _LOGGER.debug("Event is the same! Skipping (%s)", event)
+    def _notify(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        event: T,
+        source: EventSource,
+    ) -> None:
+        if (
+            isinstance(event, StateEvent)
+            and event.state == State.IDLE
+            and event_processing_data.last_event
+            and event_processing_data.last_event.state == State.DOCKED  # type: ignore[attr-defined]
+        ):
+            # TODO distinguish better between docked and idle and outside event bus. # pylint: disable=fixme
+            # Problem getCleanInfo will return state=idle, when bot is charging
+            event = StateEvent(State.DOCKED)  # type: ignore[assignment]
+        elif (
+            isinstance(event, AvailabilityEvent)
+            and event.available
+            and event_processing_data.last_event
+            and not event_processing_data.last_event.available  # type: ignore[attr-defined]
+        ):
+            # unavailable -> available: refresh everything
+            self._request_recovery_refresh()
+
+        # An identical event confirms the last one, so it is also fresh now
+        metadata = EventMetadata(time.monotonic(), time.time(), source)
+        event_processing_data.last_event_metadata = metadata
+
+        if event == event_processing_data.last_event:
+            _LOGGER.debug("Event is the same! Skipping (%s)", event)
+            self._increment(event_processing_data, Counter.DEDUPLICATED)
+            return
+
+        event_processing_data.last_event = event
+        if event_processing_data.history is not None:
+            try:
+                event_processing_data.history.append(event, metadata.received_timestamp)
+            except Exception:
+                _LOGGER.exception("Error recording history of %s", event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                _LOGGER.exception("Error in listener for %s", event)
+
+        if event_processing_data.subscribers:
+            _LOGGER.debug("Notify subscribers with %s", event)
+            # Copy as sync callbacks may unsubscribe
+            for subscriber in event_processing_data.subscribers.copy():
+                self._call_subscriber(event_processing_data, subscriber, event)
+        else:
+            _LOGGER.debug("No subscribers... Discharging %s", event)
+
+    def _call_subscriber(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        subscriber: _Subscriber[T],
+        event: T,
+    ) -> None:
+        try:
+            if subscriber.predicate is not None and not subscriber.predicate(event):
                 return
+            key = _UNSET if subscriber.key is None else subscriber.key(event)
+        except Exception:
+            _LOGGER.exception("Error in filter of subscriber for %s", event)
+            return
 
-            event_processing_data.last_event = event
-            if event_processing_data.subscriber_callbacks:
-                _LOGGER.debug("Notify subscribers with %s", event)
-                for callback in event_processing_data.subscriber_callbacks:
-                    create_task(self._tasks, callback(event))
-            else:
-                _LOGGER.debug("No subscribers... Discharging %s", event)
+        if key is not _UNSET and key == subscriber.last_key:
+            # Drop also a delayed event as it is outdated by this one
+            self._debouncer.discard(subscriber)
+            return
 
-        now = datetime.now(UTC)
-        if debounce_time <= 0 or (
-            now - event_processing_data.last_event_time
-        ) > timedelta(seconds=debounce_time):
-            _notify(event)
+        if subscriber.min_interval > 0:
+            now = asyncio.get_running_loop().time()
+            next_call_time = subscriber.last_call_time + subscriber.min_interval
+            if now < next_call_time:
+                self._debouncer.schedule(
+                    subscriber,
+                    next_call_time,
+                    lambda: self._call_subscriber(
+                        event_processing_data, subscriber, event
+                    ),
+                )
+                return
+            self._debouncer.discard(subscriber)
+            subscriber.last_call_time = now
+
+        if key is not _UNSET:
+            subscriber.last_key = key
+
+        self._increment(event_processing_data, Counter.DELIVERED)
+        if subscriber.ordered:
+            event_processing_data.ordered_calls.append((subscriber, event))
+            if event_processing_data.ordered_worker is None:
+                event_processing_data.ordered_worker = create_task(
+                    self._tasks, self._ordered_worker(event_processing_data)
+                )
+        elif subscriber.is_async:
+            self._run_callback_task(event_processing_data, subscriber.callback(event))  # type: ignore[arg-type]
         else:
-            event_processing_data.notify_handle = asyncio.get_running_loop().call_later(
-                debounce_time, _notify, event
+            self._call_sync_subscriber(event_processing_data, subscriber, event)
+
+    def _call_sync_subscriber(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        subscriber: _Subscriber[T],
+        event: T,
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            result = subscriber.callback(event)
+        except Exception:
+            _LOGGER.exception("Error in subscriber callback for %s", event)
+        else:
+            if inspect.isawaitable(result):
+                # ex. a lambda or an object with an async __call__, which returns a coroutine
+                self._run_callback_task(event_processing_data, result)
+                return
+        self._observe(
+            event_processing_data, Duration.CALLBACK, time.perf_counter() - start
+        )
+
+    def _run_callback_task(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        callback: Awaitable[None],
+    ) -> None:
+        task = create_task(
+            self._tasks, self._run_timed(event_processing_data, callback)
+        )
+        if inspect.iscoroutine(callback):
+            # Avoid "never awaited" warnings if the task is cancelled before it started
+            task.add_done_callback(lambda _: callback.close())
+
+    async def _run_timed(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        callback: Awaitable[None],
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            await callback
+        finally:
+            self._observe(
+                event_processing_data, Duration.CALLBACK, time.perf_counter() - start
             )
 
+    def _increment(
+        self, event_processing_data: _EventProcessingData[T], counter: Counter
+    ) -> None:
+        event_processing_data.metrics.counters[counter] += 1
+        if self._metrics_sink:
+            try:
+                self._metrics_sink.increment(event_processing_data.event_type, counter)
+            except Exception:
+                _LOGGER.exception("Error in metrics sink")
+
+    def _observe(
+        self,
+        event_processing_data: _EventProcessingData[T],
+        duration: Duration,
+        value: float,
+    ) -> None:
+        event_processing_data.metrics.durations[duration].observe(value)
+        if self._metrics_sink:
+            try:
+                self._metrics_sink.observe(
+                    event_processing_data.event_type, duration, value
+                )
+            except Exception:
+                _LOGGER.exception("Error in metrics sink")
+
+    def get_metrics_snapshot(self) -> MetricsSnapshot:
+        """Return snapshot of the metrics."""
+        with self._lock:
+            return MetricsSnapshot(
+                len(self._tasks),
+                {
+                    event_type: data.metrics.copy()
+                    for event_type, data in self._event_processing_dict.items()
+                },
+            )
+
+    async def _ordered_worker(
+        self, event_processing_data: _EventProcessingData[T]
+    ) -> None:
+        calls = event_processing_data.ordered_calls
+        try:
+            while calls:
+                subscriber, event = calls.popleft()
+                if subscriber not in event_processing_data.subscribers:
+                    continue
+                start = time.perf_counter()
+                try:
+                    await subscriber.callback(event)  # type: ignore[misc]
+                except Exception:
+                    _LOGGER.exception("Error in subscriber callback for %s", event)
+                self._observe(
+                    event_processing_data,
+                    Duration.CALLBACK,
+                    time.perf_counter() - start,
+                )
+        finally:
+            event_processing_data.ordered_worker = None
+
+    def add_listener(self, listener: Callable[[Event], None]) -> Callable[[], None]:
+        """Add listener, which is called synchronously with every event of any type.
+
+        Listeners are no subscribers and therefore don't trigger any refresh.
+        """
+        self._listeners.append(listener)
+
+        def remove() -> None:
+            self._listeners.remove(listener)
+
+        return remove
+
     def request_refresh(self, event_class: type[T]) -> None:
         """Request manual refresh."""
         if self.has_subscribers(event_class):
             create_task(self._tasks, self._call_refresh_function(event_class))
 
+    def stream(
+        self,
+        event_type: type[T],
+        *,
+        maxsize: int = 100,
+        overflow: StreamOverflow | str = StreamOverflow.DROP_OLDEST,
+    ) -> EventStream[T]:
+        """Return a stream of the events, which can be iterated with async for.
+
+        Events are buffered up to maxsize and overflow defines what happens if the buffer is full.
+        The stream must be closed, when it is no longer needed.
+        """
+        overflow = StreamOverflow(overflow)
+        stream = EventStream[T](maxsize, overflow)
+        unsubscribe = self.subscribe(event_type, stream.put_nowait)
+
+        def on_close() -> None:
+            unsubscribe()
+            self._streams.discard(stream)
+
+        stream.add_close_callback(on_close)
+        self._streams.add(stream)
+        return stream
+
+    def _request_recovery_refresh(self) -> None:
+        if self._recovery_refresh_task:
+            self._recovery_refresh_task.cancel()
+        self._recovery_refresh_task = create_task(self._tasks, self._recovery_refresh())
+
+    async def _recovery_refresh(self) -> None:
+        """Refresh all subscribed events in stages ordered by priority."""
+        stages: dict[int, list[type[Event]]] = {}
+        for event_type in self._event_processing_dict:
+            if event_type != AvailabilityEvent and self.has_subscribers(event_type):
+                priority = _RECOVERY_REFRESH_PRIORITIES.get(
+                    event_type, _RECOVERY_REFRESH_DEFAULT_PRIORITY
+                )
+                stages.setdefault(priority, []).append(event_type)
+
+        if _RECOVERY_REFRESH_MAX_JITTER > 0:
+            await asyncio.sleep(random.uniform(0, _RECOVERY_REFRESH_MAX_JITTER))  # noqa: S311
+
+        semaphore = _get_recovery_refresh_semaphore()
+
+        async def refresh(event_type: type[Event]) -> None:
+            async with semaphore:
+                await self._call_refresh_function(event_type)
+
+        for priority in sorted(stages):
+            _LOGGER.debug("Recovery refresh of stage %d", priority)
+            results = await asyncio.gather(
+                *(refresh(event_type) for event_type in stages[priority]),
+                return_exceptions=True,
+            )
+            for event_type, result in zip(stages[priority], results, strict=True):
+                if isinstance(result, Exception):
+                    _LOGGER.warning(
+                        "Recovery refresh of %s failed",
+                        event_type.__name__,
+                        exc_info=result,
+                    )
+
     async def teardown(self) -> None:
         """Teardown eventbus."""
+        for stream in self._streams.copy():
+            stream.close()
         await cancel(self._tasks)
+        self._debouncer.cancel()
         for data in self._event_processing_dict.values():
-            if handle := data.notify_handle:
-                handle.cancel()
+            data.ordered_calls.clear()
 
     async def _call_refresh_function(self, event_class: type[T]) -> None:
         processing_data = self._event_processing_dict[event_class]
@@ -192,12 +848,18 @@ class EventBus:
             if not commands:
                 return
 
-            if len(commands) == 1:
-                await self._execute_command(commands[0])
-            else:
-                async with asyncio.TaskGroup() as tg:
-                    for command in commands:
-                        tg.create_task(self._execute_command(command))
+            start = time.perf_counter()
+            try:
+                if len(commands) == 1:
+                    await self._execute_command(commands[0])
+                else:
+                    async with asyncio.TaskGroup() as tg:
+                        for command in commands:
+                            tg.create_task(self._execute_command(command))
+            finally:
+                self._observe(
+                    processing_data, Duration.REFRESH, time.perf_counter() - start
+                )
 
     def _get_or_create_event_processing_data(
         self, event_class: type[T]
@@ -207,7 +869,7 @@ class EventBus:
 
             if event_processing_data is None:
                 event_processing_data = _EventProcessingData(
-                    self._get_refresh_commands(event_class)
+                    event_class, self._get_refresh_commands(event_class)
                 )
                 self._event_processing_dict[event_class] = event_processing_data
 
@@ -216,13 +878,70 @@ class EventBus:
     def get_last_event(
         self,
         event_type: type[T],
+        *,
+        max_age: float | None = None,
     ) -> T | None:
-        """Get last event of type T, if available."""
+        """Get last event of type T, if available and not older than max_age seconds."""
         if event_processing := self._event_processing_dict.get(event_type, None):
+            if (
+                max_age is not None
+                and (metadata := event_processing.last_event_metadata) is not None
+                and metadata.age > max_age
+            ):
+                return None
             return event_processing.last_event
 
         return None
 
+    def enable_history(
+        self,
+        event_type: type[T],
+        fields: Sequence[str] | Mapping[str, Callable[[T], float]],
+        *,
+        capacity: int = 1440,
+    ) -> EventHistory[T]:
+        """Record the given numeric fields of all events of type T in a ring buffer.
+
+        Fields are either attribute names or a mapping of name to a function,
+        which extracts the value from the event.
+        """
+        event_processing_data = self._get_or_create_event_processing_data(event_type)
+        history = EventHistory[T](fields, capacity)
+        event_processing_data.history = history
+        return history
+
+    def get_history(self, event_type: type[T]) -> EventHistory[T] | None:
+        """Get history of the event type, if enabled."""
+        if event_processing := self._event_processing_dict.get(event_type, None):
+            return event_processing.history
+
+        return None
+
+    def get_last_event_metadata(self, event_type: type[T]) -> EventMetadata | None:
+        """Get metadata of the last event of type T, if available."""
+        if event_processing := self._event_processing_dict.get(event_type, None):
+            return event_processing.last_event_metadata
+
+        return None
+
+    async def get_or_refresh(self, event_type: type[T], max_age: float) -> T | None:
+        """Get last event of type T, if not older than max_age seconds, otherwise refresh it first.
+
+        Returns None, if no fresh event is available after the refresh.
+        """
+        if (event := self.get_last_event(event_type, max_age=max_age)) is not None:
+            return event
+
+        semaphore = self._get_or_create_event_processing_data(event_type).semaphore
+        if semaphore.locked():
+            # Wait for the running refresh
+            async with semaphore:
+                pass
+        else:
+            await self._call_refresh_function(event_type)
+
+        return self.get_last_event(event_type, max_age=max_age)
+
     def add_on_subscription_callback(
         self,
         event_type: type[T],
@@ -0,0 +1,96 @@
+"""Event history module."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from operator import attrgetter
+import time
+from typing import TYPE_CHECKING, Any, Final, Generic, TypeVar
+
+import numpy as np
+
+from .events import Event
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    import numpy.typing as npt
+
+T = TypeVar("T", bound=Event)
+
+
+class EventHistory(Generic[T]):
+    """Ring buffer, which stores selected numeric fields of events with their timestamp."""
+
+    def __init__(
+        self,
+        fields: Sequence[str] | Mapping[str, Callable[[T], float]],
+        capacity: int,
+    ) -> None:
+        if capacity <= 0:
+            msg = "capacity must be greater than 0"
+            raise ValueError(msg)
+        if not fields:
+            msg = "At least one field is required"
+            raise ValueError(msg)
+
+        getters: Mapping[str, Callable[[T], Any]] = (
+            fields
+            if isinstance(fields, Mapping)
+            else {field: attrgetter(field) for field in fields}
+        )
+        self._names: Final = tuple(getters)
+        self._getters: Final = tuple(getters.values())
+        self._capacity: Final = capacity
+        self._timestamps: Final = np.empty(capacity, dtype=np.float64)
+        self._values: Final = np.empty((capacity, len(self._names)), dtype=np.float64)
+        self._next = 0
+        self._length = 0
+
+    @property
+    def fields(self) -> tuple[str, ...]:
+        """Return names of the stored fields."""
+        return self._names
+
+    @property
+    def capacity(self) -> int:
+        """Return maximum number of stored events."""
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, event: T, timestamp: float | None = None) -> None:
+        """Store fields of the event, which overwrites the oldest entry if full."""
+        row = self._next
+        self._values[row] = [getter(event) for getter in self._getters]
+        self._timestamps[row] = time.time() if timestamp is None else timestamp
+        self._next = (row + 1) % self._capacity
+        self._length = min(self._length + 1, self._capacity)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._next = 0
+        self._length = 0
+
+    def to_numpy(
+        self, since: float | None = None
+    ) -> tuple[npt.NDArray[np.float64], dict[str, npt.NDArray[np.float64]]]:
+        """Return timestamps and a value array per field ordered from oldest to newest.
+
+        If since is given, only entries with a timestamp (as time.time()) >= since are returned.
+        The returned arrays are copies.
+        """
+        start = (self._next - self._length) % self._capacity
+        order = (np.arange(self._length) + start) % self._capacity
+        timestamps = self._timestamps[order]
+        values = self._values[order]
+
+        if since is not None:
+            first = int(np.searchsorted(timestamps, since, side="left"))
+            timestamps = timestamps[first:]
+            values = values[first:]
+
+        return timestamps, {
+            name: values[:, i].copy() for i, name in enumerate(self._names)
+        }
@@ -0,0 +1,134 @@
+"""Event hub module."""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import TYPE_CHECKING, Any, Final
+
+from .events import Event
+from .logging_filter import get_logger
+from .util import cancel, create_task
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Iterable
+
+    from .device import Device
+    from .event_bus import EventBus
+
+_LOGGER = get_logger(__name__)
+
+EventBatch = list[tuple[str, Event]]
+
+
+class _HubSubscriber:
+    """Hub subscriber."""
+
+    __slots__ = ("callback", "dids", "event_types", "is_async")
+
+    def __init__(
+        self,
+        callback: Callable[[EventBatch], Coroutine[Any, Any, None] | None],
+        event_types: frozenset[type[Event]] | None,
+        dids: frozenset[str] | None,
+    ) -> None:
+        self.callback: Final = callback
+        self.is_async: Final = inspect.iscoroutinefunction(callback)
+        self.event_types: Final = event_types
+        self.dids: Final = dids
+
+    def filter(self, batch: EventBatch) -> EventBatch:
+        """Return the part of the batch, the subscriber is interested in."""
+        if self.event_types is None and self.dids is None:
+            return batch
+
+        return [
+            (did, event)
+            for did, event in batch
+            if (self.event_types is None or type(event) in self.event_types)
+            and (self.dids is None or did in self.dids)
+        ]
+
+
+class EventHub:
+    """Hub, which collects the events of many event buses.
+
+    Events are tagged with the device id and delivered in batches.
+    All events collected until the next loop iteration or, if set, the batch interval
+    are passed as one list of (did, event) to the subscribers.
+    """
+
+    def __init__(self, *, batch_interval: float = 0) -> None:
+        self._batch_interval: Final = batch_interval
+        self._subscribers: list[_HubSubscriber] = []
+        self._batch: EventBatch = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Future[Any]] = set()
+
+    def add_event_bus(self, did: str, event_bus: EventBus) -> Callable[[], None]:
+        """Collect events of the given event bus and return the callable to remove it."""
+
+        def on_event(event: Event) -> None:
+            self._batch.append((did, event))
+            if self._flush_handle is None:
+                loop = asyncio.get_running_loop()
+                if self._batch_interval > 0:
+                    self._flush_handle = loop.call_later(
+                        self._batch_interval, self._flush
+                    )
+                else:
+                    self._flush_handle = loop.call_soon(self._flush)
+
+        return event_bus.add_listener(on_event)
+
+    def add_device(self, device: Device) -> Callable[[], None]:
+        """Collect events of the given device and return the callable to remove it."""
+        return self.add_event_bus(device.device_info["did"], device.events)
+
+    def subscribe(
+        self,
+        callback: Callable[[EventBatch], Coroutine[Any, Any, None] | None],
+        *,
+        event_types: Iterable[type[Event]] | None = None,
+        dids: Iterable[str] | None = None,
+    ) -> Callable[[], None]:
+        """Subscribe to batches of events.
+
+        If event_types or dids are None, events of all types or devices are passed.
+        Synchronous callbacks are called inline and async callbacks as task.
+        """
+        subscriber = _HubSubscriber(
+            callback,
+            None if event_types is None else frozenset(event_types),
+            None if dids is None else frozenset(dids),
+        )
+        self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._batch = self._batch, []
+
+        for subscriber in self._subscribers.copy():
+            if not (events := subscriber.filter(batch)):
+                continue
+
+            if subscriber.is_async:
+                create_task(self._tasks, subscriber.callback(events))  # type: ignore[arg-type]
+            else:
+                try:
+                    subscriber.callback(events)
+                except Exception:
+                    _LOGGER.exception("Error in event hub subscriber callback")
+
+    async def teardown(self) -> None:
+        """Teardown event hub."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._batch.clear()
+        await cancel(self._tasks)
@@ -5,16 +5,19 @@ from __future__ import annotations
 import ast
 import asyncio
 import base64
+from collections.abc import Sequence
 import dataclasses
 from datetime import UTC, datetime
 from decimal import Decimal
+from enum import IntEnum, unique
 from io import BytesIO
 import itertools
 import struct
-from typing import TYPE_CHECKING, Any, Final
+from typing import TYPE_CHECKING, Any, Final, overload
 import zlib
 
-from PIL import Image, ImageColor, ImageOps, ImagePalette
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
 import svg
 
 from deebot_client.events.map import CachedMapInfoEvent, MapChangedEvent
@@ -38,14 +41,19 @@ from .models import Room
 from .util import (
     OnChangedDict,
     OnChangedList,
+    cancel,
+    create_task,
     decompress_7z_base64_data,
 )
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Sequence
+    from collections.abc import Callable, Hashable, Iterator, Mapping
+
+    import numpy.typing as npt
 
     from .device import DeviceCommandExecute
     from .event_bus import EventBus
+    from .map_cache import MapPieceCache
 
 
 def _attributes_as_str(self) -> str:  # type: ignore[no-untyped-def] # noqa: ANN001
@@ -71,6 +79,14 @@ _ALWAYS_WRITE_COMMAND_NAME: tuple[str, ...] = (
 )
 
 
+@dataclasses.dataclass
+class _SerializedPathData(svg.PathData):
+    """Path data, which is already serialized as compact string."""
+
+    command = ""
+    value: str
+
+
 @dataclasses.dataclass
 class Path(svg.Path):  # noqa: TID251
     """Path which removes unnecessary spaces."""
@@ -78,28 +94,41 @@ class Path(svg.Path):  # noqa: TID251
     @classmethod
     def _as_str(cls, val: Any) -> str:
         if isinstance(val, list) and val and isinstance(val[0], svg.PathData):
-            result = ""
-            current = None
-            for elem in val:
-                if hasattr(elem, "attributes_as_str"):
-                    attributes = elem.attributes_as_str()
-                    # if the command is the same as the previous one, we can omit it
-                    if (
-                        current != elem.command
-                        or elem.command in _ALWAYS_WRITE_COMMAND_NAME
-                    ):
-                        current = elem.command
-                        result += elem.command
-                    elif attributes[0] != "-":
-                        # only positive values need to have a space
-                        result += " "
-                    result += elem.attributes_as_str()
-                else:
-                    current = None
-                    result += cls._as_str(elem)
-            return result
+            return cls.path_data_as_str(val)
         return super()._as_str(val)
 
+    @classmethod
+    def path_data_as_str(
+        cls, path_data: list[Any], previous_command: str | None = None
+    ) -> str:
+        """Return path data as compact string.
+
+        previous_command is the last command of the path data, which will be continued.
+        """
+        result = ""
+        current = previous_command
+        for elem in path_data:
+            if isinstance(elem, _SerializedPathData):
+                current = None
+                result += elem.value
+            elif hasattr(elem, "attributes_as_str"):
+                attributes = elem.attributes_as_str()
+                # if the command is the same as the previous one, we can omit it
+                if (
+                    current != elem.command
+                    or elem.command in _ALWAYS_WRITE_COMMAND_NAME
+                ):
+                    current = elem.command
+                    result += elem.command
+                elif attributes[0] != "-":
+                    # only positive values need to have a space
+                    result += " "
+                result += elem.attributes_as_str()
+            else:
+                current = None
+                result += cls._as_str(elem)
+        return result
+
 
 _LOGGER = get_logger(__name__)
 _PIXEL_WIDTH = 50
@@ -118,6 +147,11 @@ _POSITIONS_SVG = {
 }
 
 _OFFSET = 400
+# Same as the concurrent commands of a device, as every fetch is a command
+_MAX_CONCURRENT_MINOR_MAP_FETCHES = 3
+_MAP_PIECE_SIZE = 100
+_MAP_PIECES_PER_AXIS = 8
+_MAP_CANVAS_SIZE = _MAP_PIECE_SIZE * _MAP_PIECES_PER_AXIS
 _TRACE_MAP = "trace_map"
 _COLORS = {
     _TRACE_MAP: "#fff",
@@ -155,6 +189,116 @@ class TracePoint(Point):
     connected: bool
 
 
+_TRACE_POINT_DTYPE = np.dtype([("x", "<i2"), ("y", "<i2"), ("flags", "u1")])
+_TRACE_POINT_DISCONNECTED_FLAG = 0x80
+_TRACE_POINTS_MIN_CAPACITY = 1024
+
+
+class TracePoints(Sequence[TracePoint]):
+    """Trace points, which are stored column wise in growable numpy arrays."""
+
+    def __init__(self, on_change: Callable[[], None]) -> None:
+        self._on_change = on_change
+        self._length = 0
+        self._x: npt.NDArray[np.int16] = np.empty(0, dtype=np.int16)
+        self._y: npt.NDArray[np.int16] = np.empty(0, dtype=np.int16)
+        self._connected: npt.NDArray[np.bool_] = np.empty(0, dtype=np.bool_)
+
+    @property
+    def x(self) -> npt.NDArray[np.int16]:
+        """Return x coordinates."""
+        return self._x[: self._length]
+
+    @property
+    def y(self) -> npt.NDArray[np.int16]:
+        """Return y coordinates."""
+        return self._y[: self._length]
+
+    @property
+    def connected(self) -> npt.NDArray[np.bool_]:
+        """Return if the points are connected to their predecessor."""
+        return self._connected[: self._length]
+
+    def append(self, point: TracePoint) -> None:
+        """Add trace point."""
+        self._reserve(1)
+        self._x[self._length] = point.x
+        self._y[self._length] = point.y
+        self._connected[self._length] = point.connected
+        self._length += 1
+        self._on_change()
+
+    def extend_from_bytes(self, data: bytes) -> None:
+        """Add trace points from records of x (int16), y (int16) and flags (uint8)."""
+        records = np.frombuffer(
+            data,
+            dtype=_TRACE_POINT_DTYPE,
+            count=len(data) // _TRACE_POINT_DTYPE.itemsize,
+        )
+        if records.size == 0:
+            return
+
+        self._reserve(records.size)
+        end = self._length + records.size
+        self._x[self._length : end] = records["x"]
+        self._y[self._length : end] = records["y"]
+        self._connected[self._length : end] = (
+            records["flags"] & _TRACE_POINT_DISCONNECTED_FLAG
+        ) == 0
+        self._length = end
+        self._on_change()
+
+    def clear(self) -> None:
+        """Remove all trace points."""
+        self._length = 0
+        self._on_change()
+
+    def _reserve(self, count: int) -> None:
+        required = self._length + count
+        if required <= self._x.size:
+            return
+
+        capacity = max(required, 2 * self._x.size, _TRACE_POINTS_MIN_CAPACITY)
+        self._x = self._resize(self._x, capacity)
+        self._y = self._resize(self._y, capacity)
+        self._connected = self._resize(self._connected, capacity)
+
+    def _resize[T: np.generic](
+        self, array: npt.NDArray[T], capacity: int
+    ) -> npt.NDArray[T]:
+        resized = np.empty(capacity, dtype=array.dtype)
+        resized[: self._length] = array[: self._length]
+        return resized
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> TracePoint: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[TracePoint]: ...
+
+    def __getitem__(self, index: int | slice) -> TracePoint | list[TracePoint]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("trace point index out of range")
+
+        return TracePoint(
+            int(self._x[index]), int(self._y[index]), bool(self._connected[index])
+        )
+
+    def __iter__(self) -> Iterator[TracePoint]:
+        for x, y, connected in zip(
+            self.x.tolist(), self.y.tolist(), self.connected.tolist(), strict=True
+        ):
+            yield TracePoint(x, y, connected)
+
+
 @dataclasses.dataclass
 class BackgroundImage:
     """Background image."""
@@ -163,6 +307,17 @@ class BackgroundImage:
     image: bytes
 
 
+@unique
+class MapLayer(IntEnum):
+    """Map layer, which changes independently of the other layers."""
+
+    BACKGROUND = 0
+    ROOMS = 1
+    SUBSETS = 2
+    TRACES = 3
+    POSITIONS = 4
+
+
 class ViewBoxFloat:
     """ViewBox where all values are converted to float."""
 
@@ -221,6 +376,7 @@ _SVG_DEFS = svg.Defs(
         ),
     ]
 )
+_SVG_DEFS_STR = str(_SVG_DEFS)
 
 
 def _calc_point(
@@ -274,6 +430,74 @@ def _points_to_svg_path(
     return path_data
 
 
+def _format_path_values(first: float, second: float) -> str:
+    # only positive values need to have a space
+    return f"{first}{second}" if second < 0 else f"{first} {second}"
+
+
+def _encode_path_data(
+    x: npt.NDArray[Any],
+    y: npt.NDArray[Any],
+    connected: npt.NDArray[np.bool_] | None = None,
+    *,
+    previous_command: str | None = None,
+) -> tuple[str, str | None]:
+    """Encode points directly as compact svg path data.
+
+    The result is identical to serializing _points_to_svg_path with Path.path_data_as_str.
+    If previous_command is given, the path data continues an already serialized path,
+    which ends on the first point.
+
+    Returns the path data and the last written command.
+    """
+    if x.size == 0:
+        return "", previous_command
+
+    parts: list[str] = []
+    current = previous_command
+    if current is None:
+        current = svg.MoveTo.command
+        parts.extend((current, _format_path_values(x[0].item(), y[0].item())))
+
+    dx: list[Any]
+    dy: list[Any]
+    if np.issubdtype(x.dtype, np.integer) and np.issubdtype(y.dtype, np.integer):
+        dx = np.diff(x.astype(np.int64)).tolist()
+        dy = np.diff(y.astype(np.int64)).tolist()
+    else:
+        dx = [round(value, _ROUND_TO_DIGITS) for value in np.diff(x).tolist()]
+        dy = [round(value, _ROUND_TO_DIGITS) for value in np.diff(y).tolist()]
+    disconnected: list[bool] = (
+        [False] * len(dx) if connected is None else (~connected[1:]).tolist()
+    )
+
+    for delta_x, delta_y, move in zip(dx, dy, disconnected, strict=True):
+        if delta_x == 0 and delta_y == 0:
+            continue
+        if move:
+            command = svg.MoveToRel.command
+            values = _format_path_values(delta_x, delta_y)
+        elif delta_x == 0:
+            command = svg.VerticalLineToRel.command
+            values = f"{delta_y}"
+        elif delta_y == 0:
+            command = svg.HorizontalLineToRel.command
+            values = f"{delta_x}"
+        else:
+            command = svg.LineToRel.command
+            values = _format_path_values(delta_x, delta_y)
+
+        # if the command is the same as the previous one, we can omit it
+        if current != command or command == svg.MoveToRel.command:
+            current = command
+            parts.append(command)
+        elif values[0] != "-":
+            parts.append(" ")
+        parts.append(values)
+
+    return "".join(parts), current
+
+
 def _get_svg_positions(
     positions: list[Position], view_box: ViewBoxFloat
 ) -> list[svg.Element]:
@@ -287,13 +511,9 @@ def _get_svg_positions(
     return svg_positions
 
 
-def _get_svg_subset(
-    subset: MapSubsetEvent,
-) -> Path | svg.Polygon:
-    _LOGGER.debug("Creating svg subset for %s", subset)
-
+def _get_subset_points(subset: MapSubsetEvent) -> list[Point]:
     subset_coordinates: list[int | str] = ast.literal_eval(subset.coordinates)
-    points = [
+    return [
         _calc_point(
             float(subset_coordinates[i]),
             float(subset_coordinates[i + 1]),
@@ -301,6 +521,14 @@ def _get_svg_subset(
         for i in range(0, len(subset_coordinates), 2)
     ]
 
+
+def _get_svg_subset(
+    subset: MapSubsetEvent,
+) -> Path | svg.Polygon:
+    _LOGGER.debug("Creating svg subset for %s", subset)
+
+    points = _get_subset_points(subset)
+
     if len(points) == 2:
         # Only 2 point, use a path
         return Path(
@@ -308,7 +536,13 @@ def _get_svg_subset(
             stroke_width=1.5,
             stroke_dasharray=[4],
             vector_effect="non-scaling-stroke",
-            d=_points_to_svg_path(points),
+            d=[
+                _SerializedPathData(
+                    _encode_path_data(
+                        np.array([p.x for p in points]), np.array([p.y for p in points])
+                    )[0]
+                )
+            ],
         )
 
     # For any other points count, return a polygon that should fit any required shape
@@ -322,22 +556,545 @@ def _get_svg_subset(
     )
 
 
-def _set_image_palette(image: Image.Image) -> Image.Image:
-    """Dynamically create color palette for map image."""
-    palette_colors: list[int] = []
-    for idx in range(256):
-        palette_colors.extend(
-            _MAP_BACKGROUND_COLORS.get(idx, _DEFAULT_MAP_BACKGROUND_COLOR)
-        )
-    source_palette = ImagePalette.ImagePalette("RGB", palette_colors)
+def _get_bounding_box(
+    canvas: npt.NDArray[np.uint8],
+) -> tuple[int, int, int, int] | None:
+    """Return bounding box (left, top, right, bottom) of the used canvas area."""
+    rows = np.flatnonzero(canvas.any(axis=1))
+    if rows.size == 0:
+        return None
+
+    columns = np.flatnonzero(canvas.any(axis=0))
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+# Lookup table to convert map values into palette indexes
+_MAP_PALETTE_LUT = np.array(
+    [idx if idx in _MAP_BACKGROUND_COLORS else 1 for idx in range(256)],
+    dtype=np.uint8,
+)
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_BIT_DEPTH = 4
+_PNG_COLOR_TYPE_PALETTE = 3
+_PNG_FILTER_NONE = 0
+_PNG_FILTER_SUB = 1
+_PNG_FILTER_UP = 2
+_PNG_FILTER_PAETH = 4
+_PNG_FILTERS = (_PNG_FILTER_NONE, _PNG_FILTER_SUB, _PNG_FILTER_UP, _PNG_FILTER_PAETH)
+# Without the row above, Up equals None and Paeth equals Sub
+_PNG_FIRST_ROW_FILTERS = {
+    _PNG_FILTER_UP: _PNG_FILTER_NONE,
+    _PNG_FILTER_PAETH: _PNG_FILTER_SUB,
+}
+# zlib header for the maximum compression level
+_ZLIB_HEADER = b"\x78\xda"
+# Empty deflate block with the final flag set
+_DEFLATE_FINAL_BLOCK = b"\x03\x00"
+_ADLER32_BASE = 65521
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
 
-    image.info["transparency"] = 0
+_PNG_PALETTE_CHUNKS = _png_chunk(
+    b"PLTE",
+    b"".join(
+        bytes(_MAP_BACKGROUND_COLORS[idx]) for idx in range(len(_MAP_BACKGROUND_COLORS))
+    ),
+) + _png_chunk(b"tRNS", b"\x00")  # unknown is transparent
+_PNG_END_CHUNK = _png_chunk(b"IEND", b"")
 
-    return image.remap_palette(
-        [c[1] for c in image.getcolors()], source_palette.tobytes()
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """Combine two adler32 checksums like zlib's adler32_combine."""
+    remainder = length2 % _ADLER32_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % _ADLER32_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + _ADLER32_BASE - 1) % _ADLER32_BASE
+    sum2 = (
+        sum2 + (adler1 >> 16) + (adler2 >> 16) + _ADLER32_BASE - remainder
+    ) % _ADLER32_BASE
+    return sum1 | (sum2 << 16)
+
+
+@dataclasses.dataclass(frozen=True)
+class _EncodedBand:
+    key: tuple[int, ...]
+    data: bytes
+    adler32: int
+    length: int
+
+
+def _filter_scanlines(
+    packed: npt.NDArray[np.uint8], filter_type: int
+) -> npt.NDArray[np.uint8]:
+    """Return PNG scanlines of the packed rows filtered with the given filter type.
+
+    The first row does not use the row above, as it belongs to another band.
+    """
+    left = np.zeros_like(packed)
+    left[:, 1:] = packed[:, :-1]
+    up = np.zeros_like(packed)
+    up[1:] = packed[:-1]
+
+    if filter_type == _PNG_FILTER_SUB:
+        prediction = left
+    elif filter_type == _PNG_FILTER_UP:
+        prediction = up
+    elif filter_type == _PNG_FILTER_PAETH:
+        up_left = np.zeros_like(packed)
+        up_left[1:, 1:] = packed[:-1, :-1]
+        a, b, c = (v.astype(np.int16) for v in (left, up, up_left))
+        pa, pb, pc = np.abs(b - c), np.abs(a - c), np.abs(a + b - 2 * c)
+        prediction = np.where(
+            (pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left)
+        )
+    else:
+        prediction = np.zeros_like(packed)
+
+    scanlines = np.empty((packed.shape[0], packed.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 0] = filter_type
+    scanlines[0, 0] = _PNG_FIRST_ROW_FILTERS.get(filter_type, filter_type)
+    np.subtract(packed, prediction, out=scanlines[:, 1:])
+    return scanlines
+
+
+def _deflate_scanlines(
+    scanlines: npt.NDArray[np.uint8], key: tuple[int, ...]
+) -> _EncodedBand:
+    raw = scanlines.tobytes()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return _EncodedBand(key, data, zlib.adler32(raw), len(raw))
+
+
+def _encode_band(pixels: npt.NDArray[np.uint8], key: tuple[int, ...]) -> _EncodedBand:
+    """Encode canvas pixels as independent deflate segment of PNG scanlines.
+
+    The band is encoded with each filter type and the smallest result is used.
+    """
+    # PNG rows are stored top down, but the canvas y-axis points up
+    pixels = _MAP_PALETTE_LUT[pixels[::-1]]
+    if pixels.shape[1] % 2:
+        pixels = np.pad(pixels, ((0, 0), (0, 1)))
+
+    packed = ((pixels[:, 0::2] << 4) | pixels[:, 1::2]).astype(np.uint8)
+    return min(
+        (
+            _deflate_scanlines(_filter_scanlines(packed, filter_type), key)
+            for filter_type in _PNG_FILTERS
+        ),
+        key=lambda encoded: len(encoded.data),
     )
 
 
+class _BackgroundImageEncoder:
+    """PNG encoder for the map canvas, which re-encodes only changed bands.
+
+    A band is one row of map pieces. Each band is compressed independently and
+    the deflate segments are concatenated into a single IDAT chunk.
+    """
+
+    def __init__(self, map_data: MapData) -> None:
+        self._map_data = map_data
+        self._bands: dict[int, _EncodedBand] = {}
+
+    def encode(self) -> BackgroundImage | None:
+        """Return background image or None if the map is empty."""
+        canvas = self._map_data.map_canvas
+        if (bounding_box := _get_bounding_box(canvas)) is None:
+            self._bands.clear()
+            return None
+
+        left, top, right, bottom = bounding_box
+
+        segments: list[bytes] = []
+        adler32 = zlib.adler32(b"")
+        for band in reversed(range(_MAP_PIECES_PER_AXIS)):
+            band_top = max(top, band * _MAP_PIECE_SIZE)
+            band_bottom = min(bottom, (band + 1) * _MAP_PIECE_SIZE)
+            if band_top >= band_bottom:
+                self._bands.pop(band, None)
+                continue
+
+            key = (
+                left,
+                right,
+                band_top,
+                band_bottom,
+                *(
+                    piece.pixels_version
+                    for piece in self._map_data.map_pieces[band::_MAP_PIECES_PER_AXIS]
+                ),
+            )
+            encoded = self._bands.get(band)
+            if encoded is None or encoded.key != key:
+                _LOGGER.debug("[_BackgroundImageEncoder] Encode band %d", band)
+                encoded = _encode_band(canvas[band_top:band_bottom, left:right], key)
+                self._bands[band] = encoded
+
+            segments.append(encoded.data)
+            adler32 = _adler32_combine(adler32, encoded.adler32, encoded.length)
+
+        idat = (
+            _ZLIB_HEADER
+            + b"".join(segments)
+            + _DEFLATE_FINAL_BLOCK
+            + struct.pack(">I", adler32)
+        )
+        header = struct.pack(
+            ">IIBBBBB",
+            right - left,
+            bottom - top,
+            _PNG_BIT_DEPTH,
+            _PNG_COLOR_TYPE_PALETTE,
+            0,
+            0,
+            0,
+        )
+
+        return BackgroundImage(
+            (left, top, right, bottom),
+            _PNG_SIGNATURE
+            + _png_chunk(b"IHDR", header)
+            + _PNG_PALETTE_CHUNKS
+            + _png_chunk(b"IDAT", idat)
+            + _PNG_END_CHUNK,
+        )
+
+
+# Lookup table to convert map values into RGBA colors
+_MAP_RGBA_LUT = np.array(
+    [
+        (
+            *_MAP_BACKGROUND_COLORS.get(idx, _DEFAULT_MAP_BACKGROUND_COLOR),
+            0 if idx == 0 else 255,
+        )
+        for idx in range(256)
+    ],
+    dtype=np.uint8,
+)
+_RASTER_LINE_WIDTH = 2
+_RASTER_DEEBOT_COLOR = ImageColor.getrgb("#00f")
+_RASTER_CHARGER_COLOR = ImageColor.getrgb("#ffe605")
+_RASTER_ICON_OUTLINE_COLOR = ImageColor.getrgb("#fff")
+_RASTER_STATIC_LAYERS = (MapLayer.BACKGROUND, MapLayer.SUBSETS, MapLayer.TRACES)
+
+
+@dataclasses.dataclass(frozen=True)
+class _RasterBackground:
+    view_box: ViewBoxFloat
+    image: Image.Image
+
+
+class _MapRasterizer:
+    """Draw the map directly into a raster image without going through SVG.
+
+    Coordinates are the same as in the SVG map, where one unit is one pixel of the
+    background image. The drawn image is cached on the layer versions.
+    """
+
+    def __init__(self, map_data: MapData) -> None:
+        self._map_data = map_data
+        self._background: tuple[int, _RasterBackground | None] | None = None
+        self._static_image: tuple[Hashable, Image.Image] | None = None
+        self._image: tuple[Hashable, bytes | None] | None = None
+
+    def get_image(
+        self, image_format: str, scale: float, max_size: int | None
+    ) -> bytes | None:
+        """Return encoded image or None if the map is empty."""
+        key = (
+            tuple(
+                self._map_data.get_layer_version(layer)
+                for layer in (*_RASTER_STATIC_LAYERS, MapLayer.POSITIONS)
+            ),
+            image_format,
+            scale,
+            max_size,
+        )
+        if self._image is None or self._image[0] != key:
+            self._image = (key, self._draw(image_format, scale, max_size))
+        return self._image[1]
+
+    def _draw(
+        self, image_format: str, scale: float, max_size: int | None
+    ) -> bytes | None:
+        _LOGGER.debug("[get_image] Draw")
+        if (background := self._get_background()) is None:
+            return None
+
+        width, height = background.image.size
+        if max_size is not None:
+            scale = min(scale, max_size / max(width, height))
+
+        image = self._get_static_image(background, scale).copy()
+        self._draw_positions(ImageDraw.Draw(image), background.view_box, scale)
+
+        buffered = BytesIO()
+        try:
+            image.save(buffered, format=image_format)
+        except OSError:
+            # Format without alpha channel like JPEG; use a white background
+            _LOGGER.debug("[get_image] %s has no alpha channel", image_format)
+            buffered = BytesIO()
+            flattened = Image.new("RGB", image.size, "white")
+            flattened.paste(image, mask=image.getchannel("A"))
+            flattened.save(buffered, format=image_format)
+        return buffered.getvalue()
+
+    def _get_background(self) -> _RasterBackground | None:
+        version = self._map_data.get_layer_version(MapLayer.BACKGROUND)
+        if self._background is not None and self._background[0] == version:
+            return self._background[1]
+
+        background = None
+        canvas = self._map_data.map_canvas
+        if (bounding_box := _get_bounding_box(canvas)) is not None:
+            left, top, right, bottom = bounding_box
+            pixels = _MAP_RGBA_LUT[canvas[top:bottom, left:right][::-1]]
+            background = _RasterBackground(
+                ViewBoxFloat(
+                    svg.ViewBoxSpec(
+                        left - _OFFSET, _OFFSET - bottom, right - left, bottom - top
+                    )
+                ),
+                Image.fromarray(np.ascontiguousarray(pixels), "RGBA"),
+            )
+
+        self._background = (version, background)
+        return background
+
+    def _get_static_image(
+        self, background: _RasterBackground, scale: float
+    ) -> Image.Image:
+        """Return scaled background with subsets and traces."""
+        key = (
+            tuple(
+                self._map_data.get_layer_version(layer)
+                for layer in _RASTER_STATIC_LAYERS
+            ),
+            scale,
+        )
+        if self._static_image is not None and self._static_image[0] == key:
+            return self._static_image[1]
+
+        width, height = background.image.size
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = background.image.resize(
+            size,
+            Image.Resampling.NEAREST if scale >= 1 else Image.Resampling.BOX,
+        )
+
+        overlay = Image.new("RGBA", size)
+        draw = ImageDraw.Draw(overlay)
+        view_box = background.view_box
+
+        def to_image(x: float, y: float) -> tuple[float, float]:
+            return (x - view_box.min_x) * scale, (y - view_box.min_y) * scale
+
+        for subset in self._map_data.map_subsets.values():
+            color = _COLORS[subset.type]
+            points = [to_image(p.x, p.y) for p in _get_subset_points(subset)]
+            if len(points) == 2:
+                draw.line(points, fill=color, width=_RASTER_LINE_WIDTH)
+            else:
+                draw.polygon(
+                    points,
+                    fill=color + "30",
+                    outline=color,
+                    width=_RASTER_LINE_WIDTH,
+                )
+
+        trace_points = self._map_data.trace_values
+        if len(trace_points) > 1:
+            # Trace coordinates are scaled by 0.2 and the y-axis is flipped
+            x = (trace_points.x * 0.2 - view_box.min_x) * scale
+            y = (trace_points.y * -0.2 - view_box.min_y) * scale
+            breaks = np.flatnonzero(~trace_points.connected[1:]) + 1
+            for part_x, part_y in zip(
+                np.split(x, breaks), np.split(y, breaks), strict=True
+            ):
+                if part_x.size > 1:
+                    draw.line(
+                        list(zip(part_x.tolist(), part_y.tolist(), strict=True)),
+                        fill=_COLORS[_TRACE_MAP],
+                        width=_RASTER_LINE_WIDTH,
+                        joint="curve",
+                    )
+
+        image = Image.alpha_composite(image, overlay)
+        self._static_image = (key, image)
+        return image
+
+    def _draw_positions(
+        self, draw: ImageDraw.ImageDraw, view_box: ViewBoxFloat, scale: float
+    ) -> None:
+        for position in sorted(
+            self._map_data.positions,
+            key=lambda x: _POSITIONS_SVG[x.type].order,
+        ):
+            point = _calc_point_in_viewbox(position.x, position.y, view_box)
+            x = (point.x - view_box.min_x) * scale
+            y = (point.y - view_box.min_y) * scale
+            if position.type == PositionType.DEEBOT:
+                radius = 3.5 * scale
+                draw.ellipse(
+                    (x - radius, y - radius, x + radius, y + radius),
+                    fill=_RASTER_DEEBOT_COLOR,
+                    outline=_RASTER_ICON_OUTLINE_COLOR,
+                    width=max(1, round(0.5 * scale)),
+                )
+            else:
+                # Pin with the tip on the position
+                radius = 4 * scale
+                center_y = y - 6.4 * scale
+                draw.polygon(
+                    ((x, y), (x - radius, center_y), (x + radius, center_y)),
+                    fill=_RASTER_CHARGER_COLOR,
+                )
+                draw.ellipse(
+                    (x - radius, center_y - radius, x + radius, center_y + radius),
+                    fill=_RASTER_CHARGER_COLOR,
+                )
+                radius = 2.8 * scale
+                draw.ellipse(
+                    (x - radius, center_y - radius, x + radius, center_y + radius),
+                    fill=_RASTER_ICON_OUTLINE_COLOR,
+                )
+
+
+@dataclasses.dataclass(frozen=True)
+class _SvgBackground:
+    view_box: svg.ViewBoxSpec
+    image: str
+
+
+class _IncrementalTracePath:
+    """Trace path data, which is only extended by the new trace points."""
+
+    def __init__(self) -> None:
+        self._path_data = ""
+        self._points = 0
+        self._last_command: str | None = None
+
+    def reset(self) -> None:
+        """Reset path data."""
+        self._path_data = ""
+        self._points = 0
+        self._last_command = None
+
+    def update(self, trace_points: TracePoints) -> str:
+        """Serialize only the new trace points and return the whole path data."""
+        if len(trace_points) < self._points:
+            self.reset()
+
+        if len(trace_points) > self._points:
+            # Continue from the last serialized point, which is not written again
+            start = max(self._points - 1, 0)
+            path_data, self._last_command = _encode_path_data(
+                trace_points.x[start:],
+                trace_points.y[start:],
+                trace_points.connected[start:],
+                previous_command=self._last_command,
+            )
+            self._path_data += path_data
+            self._points = len(trace_points)
+
+        return self._path_data
+
+
+class _MinorMapFetcher:
+    """Fetch minor maps (map pieces) starting with the pieces nearest to the bot.
+
+    Fetches of the same piece and crc32 are only executed once. Outdated fetches,
+    which are still waiting for a free slot, are dropped. A GetMinorMap command
+    already sent is not stopped, as the device executes it shielded.
+    """
+
+    def __init__(
+        self,
+        execute_command: DeviceCommandExecute,
+        map_data: MapData,
+        map_piece_cache: MapPieceCache | None = None,
+    ) -> None:
+        self._execute_command = execute_command
+        self._map_data = map_data
+        self._map_piece_cache = map_piece_cache
+        self._semaphore = asyncio.Semaphore(_MAX_CONCURRENT_MINOR_MAP_FETCHES)
+        self._fetches: dict[int, tuple[tuple[str, str], asyncio.Task[None]]] = {}
+        self._tasks: set[asyncio.Future[Any]] = set()
+
+    def schedule(self, map_id: str, crc32s: Mapping[int, str]) -> None:
+        """Fetch the given pieces and cancel fetches of all other pieces."""
+        for index, (_, task) in list(self._fetches.items()):
+            if index not in crc32s:
+                _LOGGER.debug("Cancel outdated fetch of map piece %d", index)
+                task.cancel()
+
+        for index in sorted(crc32s, key=self._get_distance_to_bot):
+            key = (map_id, crc32s[index])
+            if (fetch := self._fetches.get(index)) is not None:
+                if fetch[0] == key:
+                    _LOGGER.debug("Map piece %d is already being fetched", index)
+                    continue
+                _LOGGER.debug("Cancel outdated fetch of map piece %d", index)
+                fetch[1].cancel()
+
+            task = create_task(self._tasks, self._fetch(map_id, index, crc32s[index]))
+            self._fetches[index] = (key, task)
+
+            def on_done(task: asyncio.Task[None], index: int = index) -> None:
+                if (fetch := self._fetches.get(index)) and fetch[1] is task:
+                    del self._fetches[index]
+
+            task.add_done_callback(on_done)
+
+    async def _fetch(self, map_id: str, index: int, crc32: str) -> None:
+        if (
+            self._map_piece_cache is not None
+            and (data := await self._map_piece_cache.get(map_id, index, int(crc32)))
+            is not None
+        ):
+            _LOGGER.debug("Map piece %d loaded from cache", index)
+            self._map_data.map_pieces[index].update_points_from_bytes(data)
+            return
+
+        async with self._semaphore:
+            await self._execute_command(GetMinorMap(map_id=map_id, piece_index=index))
+
+    def _get_distance_to_bot(self, index: int) -> float:
+        bot = next(
+            (p for p in self._map_data.positions if p.type == PositionType.DEEBOT),
+            None,
+        )
+        if bot is None:
+            return 0
+
+        # Convert bot position into canvas coordinates
+        x = bot.x / _PIXEL_WIDTH + _OFFSET
+        y = bot.y / _PIXEL_WIDTH + _OFFSET
+        center_x = (index // _MAP_PIECES_PER_AXIS + 0.5) * _MAP_PIECE_SIZE
+        center_y = (index % _MAP_PIECES_PER_AXIS + 0.5) * _MAP_PIECE_SIZE
+        return (center_x - x) ** 2 + (center_y - y) ** 2
+
+    def cancel_all(self) -> None:
+        """Cancel all fetches."""
+        for _, task in self._fetches.values():
+            task.cancel()
+
+    async def teardown(self) -> None:
+        """Cancel all fetches and wait for their completion."""
+        await cancel(self._tasks)
+        self._fetches.clear()
+
+
 class Map:
     """Map representation."""
 
@@ -345,16 +1102,28 @@ class Map:
         self,
         execute_command: DeviceCommandExecute,
         event_bus: EventBus,
+        *,
+        map_piece_cache: MapPieceCache | None = None,
     ) -> None:
         self._execute_command = execute_command
         self._event_bus = event_bus
+        self._map_piece_cache = map_piece_cache
+        self._map_id: str | None = None
 
         self._map_data: Final[MapData] = MapData(event_bus)
         self._amount_rooms: int = 0
         self._last_image: str | None = None
+        self._background_image_encoder = _BackgroundImageEncoder(self._map_data)
+        self._trace_path = _IncrementalTracePath()
+        self._svg_background: tuple[int, _SvgBackground | None] | None = None
+        self._svg_layers: dict[MapLayer, tuple[Hashable, str]] = {}
+        self._rasterizer = _MapRasterizer(self._map_data)
+        self._minor_map_fetcher = _MinorMapFetcher(
+            execute_command, self._map_data, map_piece_cache
+        )
         self._unsubscribers: list[Callable[[], None]] = []
 
-        async def on_map_set(event: MapSetEvent) -> None:
+        def on_map_set(event: MapSetEvent) -> None:
             if event.type == MapSetType.ROOMS:
                 self._amount_rooms = len(event.subsets)
                 for room_id in self._map_data.rooms.copy():
@@ -367,7 +1136,7 @@ class Map:
 
         self._unsubscribers.append(event_bus.subscribe(MapSetEvent, on_map_set))
 
-        async def on_map_subset(event: MapSubsetEvent) -> None:
+        def on_map_subset(event: MapSubsetEvent) -> None:
             if event.type == MapSetType.ROOMS and event.name:
                 room = Room(event.name, event.id, event.coordinates)
                 if self._map_data.rooms.get(event.id, None) != room:
@@ -393,38 +1162,9 @@ class Map:
 
     def _update_trace_points(self, data: str) -> None:
         _LOGGER.debug("[_update_trace_points] Begin")
-        trace_points = decompress_7z_base64_data(data)
-
-        for i in range(0, len(trace_points), 5):
-            position_x, position_y = struct.unpack("<hh", trace_points[i : i + 4])
-
-            point_data = trace_points[i + 4]
-
-            connected = point_data >> 7 & 1 == 0
-
-            self._map_data.trace_values.append(
-                TracePoint(position_x, position_y, connected)
-            )
-
+        self._map_data.trace_values.extend_from_bytes(decompress_7z_base64_data(data))
         _LOGGER.debug("[_update_trace_points] finish")
 
-    def _draw_map_pieces(self, image: Image.Image) -> None:
-        _LOGGER.debug("[_draw_map_pieces] Draw")
-        image_x = 0
-        image_y = 0
-
-        for i in range(64):
-            if i > 0:
-                if i % 8 != 0:
-                    image_y += 100
-                else:
-                    image_x += 100
-                    image_y = 0
-
-            current_piece = self._map_data.map_pieces[i]
-            if current_piece.in_use:
-                image.paste(current_piece.image, (image_x, image_y))
-
     def _get_svg_traces_path(self) -> Path | None:
         if len(self._map_data.trace_values) > 0:
             _LOGGER.debug("[get_svg_map] Draw Trace")
@@ -437,7 +1177,11 @@ class Map:
                 transform=[
                     svg.Scale(0.2, -0.2),
                 ],
-                d=_points_to_svg_path(self._map_data.trace_values),
+                d=[
+                    _SerializedPathData(
+                        self._trace_path.update(self._map_data.trace_values)
+                    )
+                ],
             )
 
         return None
@@ -446,36 +1190,44 @@ class Map:
         """On first MapChanged subscription."""
         unsubscribers = []
 
-        async def on_major_map(event: MajorMapEvent) -> None:
-            async with asyncio.TaskGroup() as tg:
-                for idx, value in enumerate(event.values):
-                    if (
-                        self._map_data.map_pieces[idx].crc32_indicates_update(value)
-                        and event.requested
-                    ):
-                        tg.create_task(
-                            self._execute_command(
-                                GetMinorMap(map_id=event.map_id, piece_index=idx)
-                            )
-                        )
+        def on_major_map(event: MajorMapEvent) -> None:
+            self._map_id = event.map_id
+            outdated = {
+                idx: value
+                for idx, value in enumerate(event.values)
+                if self._map_data.map_pieces[idx].crc32_indicates_update(value)
+            }
+            if event.requested:
+                self._minor_map_fetcher.schedule(event.map_id, outdated)
 
         unsubscribers.append(self._event_bus.subscribe(MajorMapEvent, on_major_map))
 
         async def on_minor_map(event: MinorMapEvent) -> None:
-            self._map_data.map_pieces[event.index].update_points(event.value)
+            piece = self._map_data.map_pieces[event.index]
+            decoded = decompress_7z_base64_data(event.value)
+            if (
+                piece.update_points_from_bytes(decoded)
+                and piece.in_use
+                and self._map_piece_cache is not None
+                and self._map_id is not None
+            ):
+                await self._map_piece_cache.set(
+                    self._map_id, event.index, piece.crc32, decoded
+                )
 
         unsubscribers.append(self._event_bus.subscribe(MinorMapEvent, on_minor_map))
 
         self._event_bus.request_refresh(CachedMapInfoEvent)
 
-        async def on_position(event: PositionsEvent) -> None:
+        def on_position(event: PositionsEvent) -> None:
             self._map_data.positions = event.positions
 
         unsubscribers.append(self._event_bus.subscribe(PositionsEvent, on_position))
 
-        async def on_map_trace(event: MapTraceEvent) -> None:
+        def on_map_trace(event: MapTraceEvent) -> None:
             if event.start == 0:
                 self._map_data.trace_values.clear()
+                self._trace_path.reset()
 
             self._update_trace_points(event.data)
 
@@ -484,6 +1236,7 @@ class Map:
         def unsub() -> None:
             for unsub in unsubscribers:
                 unsub()
+            self._minor_map_fetcher.cancel_all()
 
         return unsub
 
@@ -499,23 +1252,45 @@ class Map:
 
     def _get_background_image(self) -> BackgroundImage | None:
         """Return background image."""
-        image = Image.new("P", (6400, 6400))
-        self._draw_map_pieces(image)
-
-        bounding_box = image.getbbox()
-        if bounding_box is None:
-            return None
-
-        image = ImageOps.flip(image.crop(bounding_box))
-        image = _set_image_palette(image)
+        return self._background_image_encoder.encode()
+
+    def _get_svg_layer(
+        self, layer: MapLayer, key: Hashable, render: Callable[[], str]
+    ) -> str:
+        """Return svg fragment of the layer and render it only if the key changed."""
+        cached = self._svg_layers.get(layer)
+        if cached is None or cached[0] != key:
+            _LOGGER.debug("[get_svg_map] Render layer %s", layer.name)
+            cached = (key, render())
+            self._svg_layers[layer] = cached
+        return cached[1]
+
+    def _get_svg_background(self) -> _SvgBackground | None:
+        version = self._map_data.get_layer_version(MapLayer.BACKGROUND)
+        if self._svg_background is not None and self._svg_background[0] == version:
+            return self._svg_background[1]
+
+        svg_background = None
+        if (background := self._get_background_image()) is not None:
+            # Set map viewBox based on background map bounding box.
+            view_box = svg.ViewBoxSpec(
+                background.bounding_box[0] - _OFFSET,
+                _OFFSET - background.bounding_box[3],
+                (background.bounding_box[2] - background.bounding_box[0]),
+                (background.bounding_box[3] - background.bounding_box[1]),
+            )
+            image = svg.Image(
+                x=view_box.min_x,
+                y=view_box.min_y,
+                width=view_box.width,
+                height=view_box.height,
+                style="image-rendering: pixelated",
+                href=f"data:image/png;base64,{base64.b64encode(background.image).decode('ascii')}",
+            )
+            svg_background = _SvgBackground(view_box, str(image))
 
-        buffered = BytesIO()
-        image.save(buffered, format="PNG", optimize=True)
-
-        return BackgroundImage(
-            bounding_box,
-            buffered.getvalue(),
-        )
+        self._svg_background = (version, svg_background)
+        return svg_background
 
     def get_svg_map(self) -> str | None:
         """Return map as SVG string."""
@@ -531,77 +1306,116 @@ class Map:
         # Reset change before starting to build the SVG
         self._map_data.reset_changed()
 
-        background = self._get_background_image()
+        background = self._get_svg_background()
         if background is None:
             self._last_image = None
             return None
 
-        # Build the SVG elements
-        svg_map = svg.SVG()
-        svg_map.elements = [_SVG_DEFS]
-
-        # Set map viewBox based on background map bounding box.
-        svg_map.viewBox = svg.ViewBoxSpec(
-            background.bounding_box[0] - _OFFSET,
-            _OFFSET - background.bounding_box[3],
-            (background.bounding_box[2] - background.bounding_box[0]),
-            (background.bounding_box[3] - background.bounding_box[1]),
-        )
+        map_data = self._map_data
+        fragments = [
+            _SVG_DEFS_STR,
+            # Map background.
+            background.image,
+            # Additional subsets (VirtualWalls and NoMopZones)
+            self._get_svg_layer(
+                MapLayer.SUBSETS,
+                map_data.get_layer_version(MapLayer.SUBSETS),
+                lambda: "".join(
+                    str(_get_svg_subset(subset))
+                    for subset in map_data.map_subsets.values()
+                ),
+            ),
+            # Traces (if any)
+            self._get_svg_layer(
+                MapLayer.TRACES,
+                map_data.get_layer_version(MapLayer.TRACES),
+                lambda: str(path) if (path := self._get_svg_traces_path()) else "",
+            ),
+            # Bot and Charge stations
+            self._get_svg_layer(
+                MapLayer.POSITIONS,
+                (
+                    map_data.get_layer_version(MapLayer.POSITIONS),
+                    background.view_box,
+                ),
+                lambda: "".join(
+                    str(position)
+                    for position in _get_svg_positions(
+                        map_data.positions, ViewBoxFloat(background.view_box)
+                    )
+                ),
+            ),
+        ]
 
-        # Map background.
-        svg_map.elements.append(
-            svg.Image(
-                x=svg_map.viewBox.min_x,
-                y=svg_map.viewBox.min_y,
-                width=svg_map.viewBox.width,
-                height=svg_map.viewBox.height,
-                style="image-rendering: pixelated",
-                href=f"data:image/png;base64,{base64.b64encode(background.image).decode('ascii')}",
-            )
+        self._last_image = str(
+            svg.SVG(viewBox=background.view_box, text="".join(fragments))
         )
+        _LOGGER.debug("[get_svg_map] Finish")
+        return self._last_image
 
-        # Additional subsets (VirtualWalls and NoMopZones)
-        svg_map.elements.extend(
-            [_get_svg_subset(subset) for subset in self._map_data.map_subsets.values()]
-        )
+    def get_image(
+        self,
+        *,
+        image_format: str = "PNG",
+        scale: float = 1,
+        max_size: int | None = None,
+    ) -> bytes | None:
+        """Return map as raster image.
+
+        :param image_format: Image format supported by Pillow like PNG, WEBP or JPEG
+        :param scale: Image pixels per map pixel
+        :param max_size: Maximum width and height of the image in pixels
+        :return: Encoded image or None if no map is available
+        """
+        if not self._unsubscribers:
+            raise MapError("Please enable the map first")
 
-        # Traces (if any)
-        if svg_traces_path := self._get_svg_traces_path():
-            svg_map.elements.append(svg_traces_path)
+        if scale <= 0 or (max_size is not None and max_size <= 0):
+            raise ValueError("scale and max_size must be greater than 0")
 
-        # Bot and Charge stations
-        svg_map.elements.extend(
-            _get_svg_positions(self._map_data.positions, ViewBoxFloat(svg_map.viewBox))
-        )
+        image_format = image_format.upper()
+        Image.init()
+        if image_format not in Image.SAVE:
+            msg = f"Unsupported image format: {image_format}"
+            raise ValueError(msg)
 
-        self._last_image = str(svg_map)
-        _LOGGER.debug("[get_svg_map] Finish")
-        return self._last_image
+        return self._rasterizer.get_image(image_format, scale, max_size)
 
     async def teardown(self) -> None:
         """Teardown map."""
         for unsubscribe in self._unsubscribers:
             unsubscribe()
         self._unsubscribers.clear()
+        await self._minor_map_fetcher.teardown()
 
 
 class MapPiece:
-    """Map piece representation."""
+    """Map piece representation.
+
+    The pixels are written directly into the region of the map canvas, which belongs to this piece.
+    """
 
     _NOT_INUSE_CRC32: int = 1295764014
 
-    def __init__(self, on_change: Callable[[], None], index: int) -> None:
+    def __init__(
+        self, on_change: Callable[[], None], index: int, canvas: npt.NDArray[np.uint8]
+    ) -> None:
         self._on_change = on_change
         self._index = index
         self._crc32: int = MapPiece._NOT_INUSE_CRC32
-        self._image: Image.Image | None = None
+        self._pixels_version: int = 0
+        x = (index // _MAP_PIECES_PER_AXIS) * _MAP_PIECE_SIZE
+        y = (index % _MAP_PIECES_PER_AXIS) * _MAP_PIECE_SIZE
+        self._pixels = canvas[y : y + _MAP_PIECE_SIZE, x : x + _MAP_PIECE_SIZE]
 
     def crc32_indicates_update(self, crc32: str) -> bool:
         """Return True if update is required."""
         crc32_int = int(crc32)
         if crc32_int == MapPiece._NOT_INUSE_CRC32:
-            self._crc32 = crc32_int
-            self._image = None
+            if self.in_use:
+                self._crc32 = crc32_int
+                self._clear_pixels()
+                self._on_change()
             return False
 
         return self._crc32 != crc32_int
@@ -612,26 +1426,43 @@ class MapPiece:
         return self._crc32 != MapPiece._NOT_INUSE_CRC32
 
     @property
-    def image(self) -> Image.Image:
-        """I'm the 'x' property."""
-        if not self.in_use or self._image is None:
-            return Image.new("P", (100, 100))
-        return self._image
+    def pixels_version(self) -> int:
+        """Return version of the pixels, which is increased on every change."""
+        return self._pixels_version
+
+    def _clear_pixels(self) -> None:
+        self._pixels.fill(0)
+        self._pixels_version += 1
+
+    @property
+    def crc32(self) -> int:
+        """Return crc32 of the piece data."""
+        return self._crc32
 
     def update_points(self, base64_data: str) -> None:
         """Add map piece points."""
-        decoded = decompress_7z_base64_data(base64_data)
+        self.update_points_from_bytes(decompress_7z_base64_data(base64_data))
+
+    def update_points_from_bytes(self, decoded: bytes) -> bool:
+        """Add map piece points from decoded data and return True if changed."""
         old_crc32 = self._crc32
         self._crc32 = zlib.crc32(decoded)
 
-        if self._crc32 != old_crc32:
-            self._on_change()
+        if self._crc32 == old_crc32:
+            return False
 
+        self._on_change()
         if self.in_use:
-            im = Image.frombytes("P", (100, 100), decoded, "raw", "P", 0, -1)
-            self._image = im.rotate(-90)
+            # The piece is transmitted column by column
+            self._pixels[:] = (
+                np.frombuffer(decoded, dtype=np.uint8)
+                .reshape(_MAP_PIECE_SIZE, _MAP_PIECE_SIZE)
+                .T
+            )
+            self._pixels_version += 1
         else:
-            self._image = None
+            self._clear_pixels()
+        return True
 
     def __hash__(self) -> int:
         """Calculate hash on index and crc32."""
@@ -649,25 +1480,49 @@ class MapData:
 
     def __init__(self, event_bus: EventBus) -> None:
         self._changed: bool = False
+        self._layer_versions: Final = dict.fromkeys(MapLayer, 0)
 
-        def on_change() -> None:
-            self._changed = True
-            event_bus.notify(MapChangedEvent(datetime.now(UTC)), debounce_time=1)
+        def create_on_change(layer: MapLayer) -> Callable[[], None]:
+            def on_change() -> None:
+                self._layer_versions[layer] += 1
+                self._changed = True
+                event_bus.notify(MapChangedEvent(datetime.now(UTC)), debounce_time=1)
 
-        self._on_change = on_change
+            return on_change
+
+        on_background_change = create_on_change(MapLayer.BACKGROUND)
+        self._on_positions_change = create_on_change(MapLayer.POSITIONS)
+        self._map_canvas: Final = np.zeros(
+            (_MAP_CANVAS_SIZE, _MAP_CANVAS_SIZE), dtype=np.uint8
+        )
         self._map_pieces: OnChangedList[MapPiece] = OnChangedList(
-            on_change, [MapPiece(on_change, i) for i in range(64)]
+            on_background_change,
+            [
+                MapPiece(on_background_change, i, self._map_canvas)
+                for i in range(_MAP_PIECES_PER_AXIS**2)
+            ],
+        )
+        self._map_subsets: OnChangedDict[int, MapSubsetEvent] = OnChangedDict(
+            create_on_change(MapLayer.SUBSETS), ignore_equal=True
         )
-        self._map_subsets: OnChangedDict[int, MapSubsetEvent] = OnChangedDict(on_change)
-        self._positions: OnChangedList[Position] = OnChangedList(on_change)
-        self._rooms: OnChangedDict[int, Room] = OnChangedDict(on_change)
-        self._trace_values: OnChangedList[TracePoint] = OnChangedList(on_change)
+        self._positions: OnChangedList[Position] = OnChangedList(
+            self._on_positions_change, ignore_equal=True
+        )
+        self._rooms: OnChangedDict[int, Room] = OnChangedDict(
+            create_on_change(MapLayer.ROOMS), ignore_equal=True
+        )
+        self._trace_values: Final = TracePoints(create_on_change(MapLayer.TRACES))
 
     @property
     def changed(self) -> bool:
         """Indicate if data was changed."""
         return self._changed
 
+    @property
+    def map_canvas(self) -> npt.NDArray[np.uint8]:
+        """Return map canvas, where all map pieces are drawn into."""
+        return self._map_canvas
+
     @property
     def map_pieces(self) -> OnChangedList[MapPiece]:
         """Return map pieces."""
@@ -685,9 +1540,12 @@ class MapData:
 
     @positions.setter
     def positions(self, value: list[Position]) -> None:
+        if value == self._positions:
+            return
         if not isinstance(value, OnChangedList):
-            value = OnChangedList(self._on_change, value)
+            value = OnChangedList(self._on_positions_change, value, ignore_equal=True)
         self._positions = value
+        self._layer_versions[MapLayer.POSITIONS] += 1
         self._changed = True
 
     @property
@@ -696,10 +1554,14 @@ class MapData:
         return self._rooms
 
     @property
-    def trace_values(self) -> OnChangedList[TracePoint]:
+    def trace_values(self) -> TracePoints:
         """Return trace values."""
         return self._trace_values
 
+    def get_layer_version(self, layer: MapLayer) -> int:
+        """Return version of the layer, which is increased on every change."""
+        return self._layer_versions[layer]
+
     def reset_changed(self) -> None:
         """Reset changed value."""
         self._changed = False
@@ -0,0 +1,140 @@
+"""Map piece cache module."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+from pathlib import Path
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+from urllib.parse import quote
+import zlib
+
+from .logging_filter import get_logger
+
+if TYPE_CHECKING:
+    from os import PathLike
+
+_LOGGER = get_logger(__name__)
+
+
+class MapPieceCache(ABC):
+    """Persistent cache of decoded map pieces.
+
+    Entries are identified by map id, piece index and crc32 of the piece data.
+    Errors are logged and never raised, so a broken cache results only in fetching the piece.
+    """
+
+    async def get(self, map_id: str, piece_index: int, crc32: int) -> bytes | None:
+        """Return cached piece data or None if not cached."""
+        data = await asyncio.to_thread(self._get, map_id, piece_index, crc32)
+        if data is not None and zlib.crc32(data) != crc32:
+            _LOGGER.debug(
+                "Ignoring corrupt cache entry for map %s piece %d", map_id, piece_index
+            )
+            return None
+        return data
+
+    async def set(self, map_id: str, piece_index: int, crc32: int, data: bytes) -> None:
+        """Store piece data and replace any other data of the same piece."""
+        await asyncio.to_thread(self._set, map_id, piece_index, crc32, data)
+
+    @abstractmethod
+    def _get(self, map_id: str, piece_index: int, crc32: int) -> bytes | None:
+        """Return cached piece data. Called in an executor thread."""
+
+    @abstractmethod
+    def _set(self, map_id: str, piece_index: int, crc32: int, data: bytes) -> None:
+        """Store piece data. Called in an executor thread."""
+
+
+class DirectoryMapPieceCache(MapPieceCache):
+    """Map piece cache, which stores each piece as file in a directory per map."""
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        self._path = Path(path)
+
+    def _get_map_path(self, map_id: str) -> Path:
+        return self._path / quote(map_id, safe="")
+
+    def _get(self, map_id: str, piece_index: int, crc32: int) -> bytes | None:
+        try:
+            return (self._get_map_path(map_id) / f"{piece_index}_{crc32}").read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            _LOGGER.warning("Could not read map piece from cache", exc_info=True)
+            return None
+
+    def _set(self, map_id: str, piece_index: int, crc32: int, data: bytes) -> None:
+        map_path = self._get_map_path(map_id)
+        file_name = f"{piece_index}_{crc32}"
+        try:
+            map_path.mkdir(parents=True, exist_ok=True)
+            temp_file = map_path / f"{file_name}.tmp"
+            temp_file.write_bytes(data)
+            temp_file.replace(map_path / file_name)
+
+            for outdated in map_path.glob(f"{piece_index}_*"):
+                if outdated.name != file_name:
+                    outdated.unlink(missing_ok=True)
+        except OSError:
+            _LOGGER.warning("Could not write map piece to cache", exc_info=True)
+
+
+class SqliteMapPieceCache(MapPieceCache):
+    """Map piece cache, which stores all pieces in a sqlite database file."""
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS map_pieces ("
+                "map_id TEXT NOT NULL, "
+                "piece_index INTEGER NOT NULL, "
+                "crc32 INTEGER NOT NULL, "
+                "data BLOB NOT NULL, "
+                "PRIMARY KEY (map_id, piece_index))"
+            )
+        return self._connection
+
+    def _get(self, map_id: str, piece_index: int, crc32: int) -> bytes | None:
+        try:
+            with self._lock:
+                row = (
+                    self._get_connection()
+                    .execute(
+                        "SELECT data FROM map_pieces "
+                        "WHERE map_id = ? AND piece_index = ? AND crc32 = ?",
+                        (map_id, piece_index, crc32),
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error:
+            _LOGGER.warning("Could not read map piece from cache", exc_info=True)
+            return None
+
+        return None if row is None else bytes(row[0])
+
+    def _set(self, map_id: str, piece_index: int, crc32: int, data: bytes) -> None:
+        try:
+            with self._lock, self._get_connection() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO map_pieces VALUES (?, ?, ?, ?)",
+                    (map_id, piece_index, crc32, data),
+                )
+        except sqlite3.Error:
+            _LOGGER.warning("Could not write map piece to cache", exc_info=True)
+
+    def close(self) -> None:
+        """Close database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
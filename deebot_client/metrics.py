@@ -0,0 +1,105 @@
+"""Event bus metrics module."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from enum import StrEnum, unique
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from .events import Event
+
+# Upper bounds in seconds of the histogram buckets. The last bucket is unbounded
+DURATION_BUCKETS: Final = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+@unique
+class Counter(StrEnum):
+    """Event bus counter."""
+
+    # Events passed to notify
+    NOTIFIED = "notified"
+    # Events skipped as they are identical to the last event
+    DEDUPLICATED = "deduplicated"
+    # Events delayed or dropped by debouncing
+    DEBOUNCED = "debounced"
+    # Calls of subscriber callbacks
+    DELIVERED = "delivered"
+
+
+@unique
+class Duration(StrEnum):
+    """Event bus duration."""
+
+    CALLBACK = "callback"
+    REFRESH = "refresh"
+
+
+class Histogram:
+    """Histogram with fixed buckets."""
+
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self) -> None:
+        # Number of values per bucket of DURATION_BUCKETS and one unbounded bucket
+        self.buckets: list[int] = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        """Add value."""
+        self.buckets[bisect_left(DURATION_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> Histogram:
+        """Return copy."""
+        histogram = Histogram()
+        histogram.buckets = self.buckets.copy()
+        histogram.count = self.count
+        histogram.sum = self.sum
+        return histogram
+
+
+@dataclass(slots=True)
+class EventMetrics:
+    """Metrics of an event type."""
+
+    counters: dict[Counter, int] = field(
+        default_factory=lambda: dict.fromkeys(Counter, 0)
+    )
+    durations: dict[Duration, Histogram] = field(
+        default_factory=lambda: {duration: Histogram() for duration in Duration}
+    )
+
+    def copy(self) -> EventMetrics:
+        """Return deep copy."""
+        return EventMetrics(
+            self.counters.copy(),
+            {duration: value.copy() for duration, value in self.durations.items()},
+        )
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """Snapshot of the event bus metrics."""
+
+    # Number of running tasks of the event bus
+    tasks: int
+    events: dict[type[Event], EventMetrics]
+
+
+class MetricsSink(ABC):
+    """Sink, which receives the event bus metrics as they are recorded."""
+
+    @abstractmethod
+    def increment(self, event_type: type[Event], counter: Counter) -> None:
+        """Increment counter of event type."""
+
+    @abstractmethod
+    def observe(
+        self, event_type: type[Event], duration: Duration, value: float
+    ) -> None:
+        """Observe duration in seconds of event type."""
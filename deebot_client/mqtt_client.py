@@ -3,10 +3,15 @@
 from __future__ import annotations
 
 import asyncio
+from bisect import bisect
 from contextlib import suppress
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from datetime import datetime
+from enum import Enum, unique
+import hashlib
 import json
+import random
+import secrets
 import ssl
 from typing import TYPE_CHECKING, Any
 from urllib.parse import urlparse
@@ -18,6 +23,7 @@ from deebot_client.const import UNDEFINED, DataType, UndefinedType
 from deebot_client.exceptions import AuthenticationError, MqttError
 
 from .commands import COMMANDS_WITH_MQTT_P2P_HANDLING
+from .event_bus import EventSource, event_source
 from .logging_filter import get_logger
 from .util.continents import get_continent_url_postfix
 
@@ -29,7 +35,14 @@ if TYPE_CHECKING:
     from .event_bus import EventBus
     from .models import ApiDeviceInfo, Credentials
 
-RECONNECT_INTERVAL = 5  # seconds
+RECONNECT_INTERVAL = 5  # seconds, base delay of the default reconnect policy
+# Maximum number of topic filters in a single SUBSCRIBE/UNSUBSCRIBE packet
+_MAX_TOPICS_PER_PACKET = 64
+# Number of points per shard on the consistent hash ring
+_VIRTUAL_NODES_PER_SHARD = 64
+# Default timeout for p2p command responses, which is well below the rest timeout
+# as the device answers directly over the broker
+P2P_COMMAND_TIMEOUT = 10  # seconds
 
 _LOGGER = get_logger(__name__)
 _CLIENT_LOGGER = get_logger(f"{__name__}.client")
@@ -50,6 +63,158 @@ def _get_topics(device_info: ApiDeviceInfo) -> list[str]:
     ]
 
 
+async def _subscribe_topics(client: Client, topics: list[str]) -> None:
+    """Subscribe to topics with multiple topic filters per packet."""
+    await asyncio.gather(
+        *(
+            client.subscribe(
+                [(topic, 0) for topic in topics[i : i + _MAX_TOPICS_PER_PACKET]]
+            )
+            for i in range(0, len(topics), _MAX_TOPICS_PER_PACKET)
+        )
+    )
+
+
+async def _unsubscribe_topics(client: Client, topics: list[str]) -> None:
+    """Unsubscribe from topics with multiple topic filters per packet."""
+    await asyncio.gather(
+        *(
+            client.unsubscribe(topics[i : i + _MAX_TOPICS_PER_PACKET])
+            for i in range(0, len(topics), _MAX_TOPICS_PER_PACKET)
+        )
+    )
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+
+class _HashRing:
+    """Consistent hash ring, which maps device ids to shards."""
+
+    def __init__(self, shards: int) -> None:
+        ring = sorted(
+            (_hash(f"{shard}/{node}"), shard)
+            for shard in range(shards)
+            for node in range(_VIRTUAL_NODES_PER_SHARD)
+        )
+        self._hashes = [hash_ for hash_, _ in ring]
+        self._shards = [shard for _, shard in ring]
+
+    def get_shard(self, key: str) -> int:
+        """Return shard index for given key."""
+        index = bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+@unique
+class _TopicKind(Enum):
+    ATR = "atr"
+    P2P = "p2p"
+
+
+_DATA_TYPES: dict[str, DataType] = {
+    **{data_type.value: data_type for data_type in DataType},
+    **{data_type.value.upper(): data_type for data_type in DataType},
+}
+
+
+@dataclass(frozen=True, slots=True)
+class _Topic:
+    """Parsed topic."""
+
+    value: str
+    kind: _TopicKind
+    command_name: str
+    # did of the device, which sends the message
+    did: str
+    data_type: DataType | None
+    raw_data_type: str
+    # only set for p2p topics
+    is_request: bool = False
+    request_id: str = ""
+
+
+def _parse_topic(topic: str) -> _Topic | None:
+    """Parse topic into a record. Returns None for unsupported topics."""
+    if topic.startswith("iot/atr/"):
+        return _parse_atr_topic(topic)
+
+    parts = topic.split("/")
+    if len(parts) == 12 and parts[0] == "iot" and parts[1] == "p2p":
+        # see _get_topics
+        return _Topic(
+            topic,
+            _TopicKind.P2P,
+            parts[2],
+            parts[3],
+            _DATA_TYPES.get(parts[11]),
+            parts[11],
+            is_request=parts[9] == "q",
+            request_id=parts[10],
+        )
+
+    return None
+
+
+def _parse_atr_topic(topic: str) -> _Topic | None:
+    """Parse atr topic into a record."""
+    parts = topic.split("/")
+    if len(parts) < 7:
+        return None
+
+    # iot/atr/[command]/[did]/[class]/[resource]/[data type]
+    return _Topic(
+        topic,
+        _TopicKind.ATR,
+        parts[2],
+        parts[3],
+        _DATA_TYPES.get(parts[-1]),
+        parts[-1],
+    )
+
+
+@dataclass(frozen=True, kw_only=True)
+class ReconnectPolicy:
+    """Reconnect policy with exponential backoff and full jitter.
+
+    The first retry after a lost connection is immediate. Afterwards the delay is a
+    random value between 0 and base_delay * multiplier ** (attempt - 1), capped at
+    max_delay. The backoff is reset, when a connection was stable for reset_after seconds.
+    """
+
+    base_delay: float = RECONNECT_INTERVAL
+    multiplier: float = 2
+    max_delay: float = 300
+    reset_after: float = 60
+
+    def get_delay(self, attempt: int) -> float:
+        """Return delay in seconds before the given reconnect attempt (0 based)."""
+        if attempt == 0:
+            return 0
+        try:
+            backoff = self.base_delay * self.multiplier ** (attempt - 1)
+        except OverflowError:
+            backoff = self.max_delay
+        return random.uniform(0, min(self.max_delay, backoff))  # noqa: S311
+
+
+@dataclass(slots=True)
+class ReconnectStats:
+    """Reconnect statistics of a broker connection."""
+
+    # Number of successful connections
+    connects: int = 0
+    # Number of failed connection attempts and lost connections
+    failures: int = 0
+    # Failures since the last successful connection
+    consecutive_failures: int = 0
+    # Delay in seconds before the last reconnect attempt
+    last_delay: float = 0
+    last_connected_at: datetime | None = None
+    last_disconnected_at: datetime | None = None
+
+
 @dataclass(frozen=True, kw_only=True)
 class MqttConfiguration:
     """Mqtt configuration."""
@@ -58,6 +223,9 @@ class MqttConfiguration:
     port: int
     ssl_context: ssl.SSLContext | None
     device_id: str
+    shards: int = 1
+    reconnect_policy: ReconnectPolicy = field(default_factory=ReconnectPolicy)
+    p2p_command_timeout: float = P2P_COMMAND_TIMEOUT
 
 
 def create_mqtt_config(
@@ -66,8 +234,17 @@ def create_mqtt_config(
     country: str,
     override_mqtt_url: str | None = None,
     ssl_context: ssl.SSLContext | None | UndefinedType = UNDEFINED,
+    shards: int = 1,
+    reconnect_policy: ReconnectPolicy | None = None,
+    p2p_command_timeout: float = P2P_COMMAND_TIMEOUT,
 ) -> MqttConfiguration:
-    """Create configuration."""
+    """Create configuration.
+
+    With shards > 1 the devices are spread across multiple broker connections.
+    """
+    if shards < 1:
+        raise MqttError("At least one shard is required")
+
     continent_postfix = get_continent_url_postfix(country.upper())
     ssl_ctx = None if ssl_context is UNDEFINED else ssl_context
 
@@ -101,6 +278,9 @@ def create_mqtt_config(
         port=port,
         ssl_context=ssl_ctx,
         device_id=device_id,
+        shards=shards,
+        reconnect_policy=reconnect_policy or ReconnectPolicy(),
+        p2p_command_timeout=p2p_command_timeout,
     )
 
 
@@ -113,6 +293,20 @@ class SubscriberInfo:
     callback: Callable[[str, str | bytes | bytearray], None]
 
 
+@dataclass
+class _Shard:
+    """A single broker connection with its own receive loop and reconnect state."""
+
+    index: int
+    subscription_changes: asyncio.Queue[tuple[SubscriberInfo, bool]] = field(
+        default_factory=asyncio.Queue
+    )
+    mqtt_task: asyncio.Task[Any] | None = None
+    reconnect_stats: ReconnectStats = field(default_factory=ReconnectStats)
+    # Connected client, which is used to publish messages
+    client: Client | None = None
+
+
 class MqttClient:
     """MQTT client."""
 
@@ -125,18 +319,27 @@ class MqttClient:
         self._authenticator = authenticator
 
         self._subscriptions: MutableMapping[str, SubscriberInfo] = {}
-        self._subscription_changes: asyncio.Queue[tuple[SubscriberInfo, bool]] = (
-            asyncio.Queue()
-        )
-        self._mqtt_task: asyncio.Task[Any] | None = None
+        # Parsed atr topics of the subscribed devices
+        self._atr_topics: dict[str, _Topic] = {}
+        self._shards = [_Shard(index) for index in range(config.shards)]
+        self._hash_ring = _HashRing(config.shards)
 
         self._received_p2p_commands: MutableMapping[str, CommandMqttP2P] = TTLCache(
             maxsize=60 * 60, ttl=60
         )
         self._last_message_received_at: datetime | None = None
+        # Responses to own p2p requests by request id
+        self._p2p_requests: dict[str, asyncio.Future[str | bytes | bytearray]] = {}
+        self._topic_handlers: dict[
+            _TopicKind, Callable[[_Topic, str | bytes | bytearray], None]
+        ] = {
+            _TopicKind.ATR: self._handle_atr,
+            _TopicKind.P2P: self._handle_p2p,
+        }
 
         async def on_credentials_changed(_: Credentials) -> None:
-            await self._create_mqtt_task()
+            for shard in self._shards:
+                await self._create_mqtt_task(shard)
 
         authenticator.subscribe(on_credentials_changed)
 
@@ -145,6 +348,11 @@ class MqttClient:
         """Return the datetime of the last received message or None."""
         return self._last_message_received_at
 
+    @property
+    def reconnect_stats(self) -> tuple[ReconnectStats, ...]:
+        """Return reconnect statistics per broker connection."""
+        return tuple(replace(shard.reconnect_stats) for shard in self._shards)
+
     async def verify_config(self) -> None:
         """Verify config by connecting to the broker."""
         try:
@@ -157,28 +365,86 @@ class MqttClient:
     async def subscribe(self, info: SubscriberInfo) -> Callable[[], None]:
         """Subscribe for messages from given device."""
         await self.connect()
-        self._subscription_changes.put_nowait((info, True))
+        shard = self._get_shard(info.device_info["did"])
+        shard.subscription_changes.put_nowait((info, True))
 
         def unsubscribe() -> None:
-            self._subscription_changes.put_nowait((info, False))
+            shard.subscription_changes.put_nowait((info, False))
 
         return unsubscribe
 
+    async def execute_p2p_command(
+        self,
+        device_info: ApiDeviceInfo,
+        command_name: str,
+        payload: dict[str, Any] | list[Any] | str,
+    ) -> dict[str, Any]:
+        """Publish command as p2p request and return the response of the device.
+
+        Raises MqttError if the request could not be published
+        and TimeoutError if the device does not respond in time.
+        """
+        shard = self._get_shard(device_info["did"])
+        if (client := shard.client) is None:
+            raise MqttError("Not connected")
+        if device_info["did"] not in self._subscriptions:
+            # Responses are only received after the device topics are subscribed
+            raise MqttError("Device not subscribed")
+
+        credentials = await self._authenticator.authenticate()
+        request_id = secrets.token_hex(8)
+        topic = (
+            f"iot/p2p/{command_name}/{credentials.user_id}/ecouser/{self._config.device_id}/"
+            f"{device_info['did']}/{device_info['class']}/{device_info['resource']}/q/{request_id}/j"
+        )
+        future: asyncio.Future[str | bytes | bytearray] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._p2p_requests[request_id] = future
+        try:
+            await client.publish(
+                topic, payload if isinstance(payload, str) else json.dumps(payload)
+            )
+            async with asyncio.timeout(self._config.p2p_command_timeout):
+                response = await future
+        except AioMqttError as ex:
+            raise MqttError("Could not publish p2p request") from ex
+        finally:
+            del self._p2p_requests[request_id]
+
+        data: dict[str, Any] = json.loads(response)
+        return data
+
     async def connect(self) -> None:
         """Connect to MQTT."""
-        if self._mqtt_task is None or self._mqtt_task.done():
+        shards = [
+            shard
+            for shard in self._shards
+            if shard.mqtt_task is None or shard.mqtt_task.done()
+        ]
+        if shards:
             # call authenticator to verify that we have valid credentials
             await self._authenticator.authenticate()
 
-            await self._create_mqtt_task()
+            for shard in shards:
+                await self._create_mqtt_task(shard)
 
     async def disconnect(self) -> None:
         """Disconnect from MQTT."""
-        await self._cancel_mqtt_task()
+        for shard in self._shards:
+            await self._cancel_mqtt_task(shard)
 
-    async def _get_client(self) -> Client:
+    def _get_shard(self, did: str) -> _Shard:
+        if len(self._shards) == 1:
+            return self._shards[0]
+        return self._shards[self._hash_ring.get_shard(did)]
+
+    async def _get_client(self, shard_index: int = 0) -> Client:
         credentials = await self._authenticator.authenticate()
         client_id = f"{credentials.user_id}@ecouser/{self._config.device_id}"
+        if shard_index:
+            # Each connection requires an unique client id
+            client_id = f"{client_id}_{shard_index}"
         return Client(
             hostname=self._config.hostname,
             port=self._config.port,
@@ -189,21 +455,39 @@ class MqttClient:
             tls_context=self._config.ssl_context,
         )
 
-    async def _cancel_mqtt_task(self) -> None:
-        if self._mqtt_task is not None and self._mqtt_task.cancel():
+    async def _cancel_mqtt_task(self, shard: _Shard) -> None:
+        if shard.mqtt_task is not None and shard.mqtt_task.cancel():
             # Wait for the task to be cancelled
             with suppress(asyncio.CancelledError):
-                await self._mqtt_task
+                await shard.mqtt_task
+
+    async def _create_mqtt_task(self, shard: _Shard) -> None:
+        policy = self._config.reconnect_policy
+        stats = shard.reconnect_stats
+        loop = asyncio.get_running_loop()
 
-    async def _create_mqtt_task(self) -> None:
         async def mqtt() -> None:
+            attempt = 0
             while True:
+                connected_at: float | None = None
+                error: AioMqttError | None = None
                 try:
-                    async with await self._get_client() as client:
+                    async with await self._get_client(shard.index) as client:
+                        shard.client = client
+                        connected_at = loop.time()
+                        stats.connects += 1
+                        stats.consecutive_failures = 0
+                        stats.last_connected_at = datetime.now()
                         _LOGGER.debug("Subscribe to all previous subscriptions")
-                        for info in self._subscriptions.values():
-                            for topic in _get_topics(info.device_info):
-                                await client.subscribe(topic)
+                        await _subscribe_topics(
+                            client,
+                            [
+                                topic
+                                for did, info in self._subscriptions.items()
+                                if self._get_shard(did) is shard
+                                for topic in _get_topics(info.device_info)
+                            ],
+                        )
 
                         async def listen() -> None:
                             async for message in client.messages:
@@ -212,7 +496,7 @@ class MqttClient:
                         tasks = [
                             asyncio.create_task(listen()),
                             asyncio.create_task(
-                                self._pending_subscriptions_worker(client)
+                                self._pending_subscriptions_worker(client, shard)
                             ),
                         ]
                         try:
@@ -221,14 +505,11 @@ class MqttClient:
                                 tasks, return_when=asyncio.FIRST_COMPLETED
                             )
                         finally:
+                            shard.client = None
                             for task in tasks:
                                 task.cancel()
-                except AioMqttError:
-                    _LOGGER.warning(
-                        "Connection lost; Reconnecting in %d seconds ...",
-                        RECONNECT_INTERVAL,
-                        exc_info=True,
-                    )
+                except AioMqttError as ex:
+                    error = ex
                 except AuthenticationError:
                     _LOGGER.exception(
                         "Could not authenticate. Please check your credentials and afterwards reload the integration."
@@ -238,10 +519,24 @@ class MqttClient:
                     _LOGGER.exception("An exception occurred")
                     return
 
-                await asyncio.sleep(RECONNECT_INTERVAL)
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                if connected_at is not None:
+                    stats.last_disconnected_at = datetime.now()
+                    if loop.time() - connected_at >= policy.reset_after:
+                        attempt = 0
+
+                stats.last_delay = delay = policy.get_delay(attempt)
+                attempt += 1
+                _LOGGER.warning(
+                    "Connection lost; Reconnecting in %.1f seconds ...",
+                    delay,
+                    exc_info=error,
+                )
+                await asyncio.sleep(delay)
 
-        await self._cancel_mqtt_task()
-        self._mqtt_task = asyncio.create_task(mqtt())
+        await self._cancel_mqtt_task(shard)
+        shard.mqtt_task = asyncio.create_task(mqtt())
 
     def _handle_message(self, message: Message) -> None:
         _LOGGER.debug(
@@ -257,50 +552,88 @@ class MqttClient:
             )
             return
 
-        topic_split = message.topic.value.split("/")
-        if message.topic.matches("iot/atr/#"):
-            self._handle_atr(topic_split, message.payload)
-        elif message.topic.matches("iot/p2p/#"):
-            self._handle_p2p(topic_split, message.payload)
-        else:
+        if (topic := self._get_topic(message.topic.value)) is None:
             _LOGGER.debug("Got unsupported topic: %s", message.topic)
+            return
 
-    async def _pending_subscriptions_worker(self, client: Client) -> None:
-        while True:
-            (info, add) = await self._subscription_changes.get()
+        self._topic_handlers[topic.kind](topic, message.payload)
 
-            device_info = info.device_info
-            for topic in _get_topics(device_info):
+    async def _pending_subscriptions_worker(
+        self, client: Client, shard: _Shard
+    ) -> None:
+        queue = shard.subscription_changes
+        while True:
+            # Drain all queued changes, where the last change per device wins
+            changes = [await queue.get()]
+            while not queue.empty():
+                changes.append(queue.get_nowait())
+            latest = {info.device_info["did"]: (info, add) for info, add in changes}
+
+            subscribe: list[str] = []
+            unsubscribe: list[str] = []
+            for did, (info, add) in latest.items():
                 if add:
-                    await client.subscribe(topic)
-                else:
-                    await client.unsubscribe(topic)
-
-            if add:
-                self._subscriptions[device_info["did"]] = info
-            else:
-                self._subscriptions.pop(device_info["did"], None)
-
-            self._subscription_changes.task_done()
+                    subscribe.extend(_get_topics(info.device_info))
+                elif did in self._subscriptions:
+                    unsubscribe.extend(_get_topics(info.device_info))
+
+            try:
+                await asyncio.gather(
+                    _subscribe_topics(client, subscribe),
+                    _unsubscribe_topics(client, unsubscribe),
+                )
 
-    def _handle_atr(
-        self, topic_split: list[str], payload: str | bytes | bytearray
-    ) -> None:
+                for did, (info, add) in latest.items():
+                    if add:
+                        self._subscriptions[did] = info
+                    else:
+                        self._subscriptions.pop(did, None)
+                        self._discard_atr_topics(did)
+            finally:
+                for _ in changes:
+                    queue.task_done()
+
+    def _get_topic(self, value: str) -> _Topic | None:
+        if (topic := self._atr_topics.get(value)) is not None:
+            return topic
+
+        topic = _parse_topic(value)
+        # p2p topics contain an unique request id and are therefore not cached
+        if (
+            topic is not None
+            and topic.kind is _TopicKind.ATR
+            and topic.did in self._subscriptions
+        ):
+            self._atr_topics[value] = topic
+        return topic
+
+    def _discard_atr_topics(self, did: str) -> None:
+        for value in [
+            value for value, topic in self._atr_topics.items() if topic.did == did
+        ]:
+            del self._atr_topics[value]
+
+    def _handle_atr(self, topic: _Topic, payload: str | bytes | bytearray) -> None:
         try:
-            if sub_info := self._subscriptions.get(topic_split[3]):
-                sub_info.callback(topic_split[2], payload)
+            if sub_info := self._subscriptions.get(topic.did):
+                with event_source(EventSource.MQTT):
+                    sub_info.callback(topic.command_name, payload)
         except Exception:  # pylint: disable=broad-except
             _LOGGER.exception("An exception occurred during handling atr message")
 
-    def _handle_p2p(
-        self, topic_split: list[str], payload: str | bytes | bytearray
-    ) -> None:
+    def _handle_p2p(self, topic: _Topic, payload: str | bytes | bytearray) -> None:
         try:
-            if (data_type := DataType.get(topic_split[11])) is None:
-                _LOGGER.warning('Unsupported data type: "%s"', topic_split[11])
+            if (future := self._p2p_requests.get(topic.request_id)) is not None:
+                # Own request; the request itself is ignored
+                if not topic.is_request and not future.done():
+                    future.set_result(payload)
+                return
+
+            if (data_type := topic.data_type) is None:
+                _LOGGER.warning('Unsupported data type: "%s"', topic.raw_data_type)
                 return
 
-            command_name = topic_split[2]
+            command_name = topic.command_name
             command_type = COMMANDS_WITH_MQTT_P2P_HANDLING.get(data_type, {}).get(
                 command_name, None
             )
@@ -310,17 +643,15 @@ class MqttClient:
                 )
                 return
 
-            is_request = topic_split[9] == "q"
-            request_id = topic_split[10]
-
-            if is_request:
+            request_id = topic.request_id
+            if topic.is_request:
                 payload_json = json.loads(payload)
                 try:
                     data = payload_json["body"]["data"]
                 except KeyError:
                     _LOGGER.warning(
                         "Could not parse p2p payload: topic=%s; payload=%s",
-                        "/".join(topic_split),
+                        topic.value,
                         payload_json,
                     )
                     return
@@ -329,9 +660,10 @@ class MqttClient:
                     data
                 )
             elif command := self._received_p2p_commands.pop(request_id, None):
-                if sub_info := self._subscriptions.get(topic_split[3]):
+                if sub_info := self._subscriptions.get(topic.did):
                     data = json.loads(payload)
-                    command.handle_mqtt_p2p(sub_info.events, data)
+                    with event_source(EventSource.P2P):
+                        command.handle_mqtt_p2p(sub_info.events, data)
             else:
                 _LOGGER.debug(
                     "Response to command came in probably to late. requestId=%s, commandName=%s",
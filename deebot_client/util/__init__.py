@@ -8,7 +8,7 @@ from contextlib import suppress
 from enum import Enum
 import hashlib
 import lzma
-from typing import TYPE_CHECKING, Any, TypeVar
+from typing import TYPE_CHECKING, Any, Self, SupportsIndex, TypeVar, overload
 
 from deebot_client.logging_filter import get_logger
 
@@ -76,30 +76,107 @@ def get_enum(enum: type[_S], value: str) -> _S:
 
 
 class OnChangedList(list[_T]):
-    """List, which will call passed on_change if a change happens."""
-
-    _MODIFYING_FUNCTIONS = (
-        "append",
-        "clear",
-        "extend",
-        "insert",
-        "pop",
-        "remove",
-        "__setitem__",
-        "__delitem__",
-        "__add__",
-    )
+    """List, which will call passed on_change after a change happened.
+
+    Only the mutating methods are overridden, so reads have no overhead.
+    The version is increased on every change.
+    """
 
     def __init__(
-        self, on_change: Callable[[], None], iterable: Iterable[_T] = ()
+        self,
+        on_change: Callable[[], None],
+        iterable: Iterable[_T] = (),
+        *,
+        ignore_equal: bool = False,
     ) -> None:
         super().__init__(iterable)
         self._on_change = on_change
-
-    def __getattribute__(self, name: str, /) -> Any:
-        if name in OnChangedList._MODIFYING_FUNCTIONS:
-            self._on_change()
-        return super().__getattribute__(name)
+        self._ignore_equal = ignore_equal
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Return version, which is increased on every change."""
+        return self._version
+
+    def _changed(self) -> None:
+        self._version += 1
+        self._on_change()
+
+    def append(self, value: _T, /) -> None:
+        """Append value to the end of the list."""
+        super().append(value)
+        self._changed()
+
+    def extend(self, values: Iterable[_T], /) -> None:
+        """Extend list by appending values."""
+        length = len(self)
+        super().extend(values)
+        if len(self) != length:
+            self._changed()
+
+    def insert(self, index: SupportsIndex, value: _T, /) -> None:
+        """Insert value before index."""
+        super().insert(index, value)
+        self._changed()
+
+    def pop(self, index: SupportsIndex = -1, /) -> _T:
+        """Remove and return item at index."""
+        value = super().pop(index)
+        self._changed()
+        return value
+
+    def remove(self, value: _T, /) -> None:
+        """Remove first occurrence of value."""
+        super().remove(value)
+        self._changed()
+
+    def clear(self) -> None:
+        """Remove all items."""
+        if self:
+            super().clear()
+            self._changed()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        """Sort list in place."""
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        """Reverse list in place."""
+        super().reverse()
+        self._changed()
+
+    @overload
+    def __setitem__(self, key: SupportsIndex, value: _T, /) -> None: ...
+
+    @overload
+    def __setitem__(self, key: slice, value: Iterable[_T], /) -> None: ...
+
+    def __setitem__(self, key: SupportsIndex | slice, value: Any, /) -> None:
+        if (
+            self._ignore_equal
+            and not isinstance(key, slice)
+            and super().__getitem__(key) == value
+        ):
+            return
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key: SupportsIndex | slice, /) -> None:
+        super().__delitem__(key)
+        self._changed()
+
+    def __iadd__(self, values: Iterable[_T], /) -> Self:  # type: ignore[misc,override]
+        self.extend(values)
+        return self
+
+    def __imul__(self, value: SupportsIndex, /) -> Self:
+        length = len(self)
+        super().__imul__(value)
+        if len(self) != length:
+            self._changed()
+        return self
 
 
 _KT = TypeVar("_KT")
@@ -107,27 +184,87 @@ _VT = TypeVar("_VT")
 
 
 class OnChangedDict(dict[_KT, _VT]):
-    """Dict, which will call passed on_change if a change happens."""
+    """Dict, which will call passed on_change after a change happened.
 
-    _MODIFYING_FUNCTIONS = (
-        "clear",
-        "pop",
-        "popitem",
-        "update",
-        "__setitem__",
-        "__delitem__",
-    )
+    Only the mutating methods are overridden, so reads have no overhead.
+    The version is increased on every change.
+    If ignore_equal is set, writing a value equal to the current one is no change.
+    """
 
     def __init__(
-        self, on_change: Callable[[], None], iterable: Iterable[tuple[_KT, _VT]] = ()
+        self,
+        on_change: Callable[[], None],
+        iterable: Iterable[tuple[_KT, _VT]] = (),
+        *,
+        ignore_equal: bool = False,
     ) -> None:
         super().__init__(iterable)
         self._on_change = on_change
-
-    def __getattribute__(self, name: str, /) -> Any:
-        if name in OnChangedDict._MODIFYING_FUNCTIONS:
-            self._on_change()
-        return super().__getattribute__(name)
+        self._ignore_equal = ignore_equal
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Return version, which is increased on every change."""
+        return self._version
+
+    def _changed(self) -> None:
+        self._version += 1
+        self._on_change()
+
+    def _set(self, key: _KT, value: _VT) -> bool:
+        if self._ignore_equal and key in self and super().__getitem__(key) == value:
+            return False
+        super().__setitem__(key, value)
+        return True
+
+    def __setitem__(self, key: _KT, value: _VT, /) -> None:
+        if self._set(key, value):
+            self._changed()
+
+    def __delitem__(self, key: _KT, /) -> None:
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other: Any, /) -> Self:  # type: ignore[misc,override]
+        self.update(other)
+        return self
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        """Update dict from mapping/iterable and keyword arguments."""
+        changed = False
+        for key, value in dict(*args, **kwargs).items():
+            changed = self._set(key, value) or changed
+        if changed:
+            self._changed()
+
+    def setdefault(self, key: _KT, default: _VT = None, /) -> _VT:  # type: ignore[assignment]
+        """Insert key with default if key is not in dict and return its value."""
+        if key in self:
+            return super().__getitem__(key)
+        super().__setitem__(key, default)
+        self._changed()
+        return default
+
+    def pop(self, key: _KT, /, *args: Any) -> Any:
+        """Remove key and return its value or the default if given."""
+        if key not in self:
+            return super().pop(key, *args)
+        value = super().pop(key)
+        self._changed()
+        return value
+
+    def popitem(self) -> tuple[_KT, _VT]:
+        """Remove and return the last inserted item."""
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self) -> None:
+        """Remove all items."""
+        if self:
+            super().clear()
+            self._changed()
 
 
 LST = list[_T] | set[_T] | tuple[_T, ...]
@@ -14,6 +14,7 @@ from deebot_client.models import (
 
 if TYPE_CHECKING:
     from deebot_client.events import Event
+    from deebot_client.mqtt_client import MqttClient
 
 
 def _wrap_command(
@@ -28,9 +29,12 @@ def _wrap_command(
         authenticator: Authenticator,
         device_info: ApiDeviceInfo,
         event_bus: EventBus,
+        mqtt_client: MqttClient | None = None,
     ) -> tuple[CommandResult, dict[str, Any]]:
         nonlocal result, response
-        result, response = await execute_fn(authenticator, device_info, event_bus)
+        result, response = await execute_fn(
+            authenticator, device_info, event_bus, mqtt_client
+        )
         return result, response
 
     def verify_result(
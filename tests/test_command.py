@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from types import MappingProxyType
 from typing import TYPE_CHECKING, Any
+from unittest.mock import AsyncMock
 
 from aiohttp import ClientTimeout
 import pytest
 
 from deebot_client.command import CommandMqttP2P, CommandResult, InitParam
+from deebot_client.commands.json.battery import GetBattery
+from deebot_client.commands.json.custom import CustomCommand
+from deebot_client.commands.json.play_sound import PlaySound
 from deebot_client.const import DataType
-from deebot_client.exceptions import ApiTimeoutError, DeebotError
+from deebot_client.event_bus import EventSource
+from deebot_client.events import BatteryEvent
+from deebot_client.exceptions import ApiTimeoutError, DeebotError, MqttError
+from deebot_client.mqtt_client import MqttClient
 
 if TYPE_CHECKING:
     from unittest.mock import Mock
@@ -91,3 +99,81 @@ async def test_execute_api_timeout_error(
         logging.WARNING,
         "Could not execute command TestCommand: Timeout reached",
     ) in caplog.record_tuples
+
+
+def test_command_hash() -> None:
+    command = CustomCommand("test", {"a": [1, {"b": 2}], "c": 3})
+    same = CustomCommand("test", {"c": 3, "a": [1, {"b": 2}]})
+
+    assert command == same
+    assert hash(command) == hash(same)
+    assert {command: 1}[same] == 1
+    assert hash(command) != hash(CustomCommand("test", {"a": [1, {"b": 3}], "c": 3}))
+
+
+async def test_execute_mqtt_p2p(
+    authenticator: Mock, api_device_info: ApiDeviceInfo, event_bus: EventBus
+) -> None:
+    """Test that the command is sent over mqtt p2p if a mqtt client is given."""
+    mqtt_client = AsyncMock(spec=MqttClient)
+    mqtt_client.execute_p2p_command.return_value = {
+        "header": {"pri": 1, "tzm": 480, "ts": "1304623069888", "ver": "0.0.1"},
+        "body": {"code": 0, "msg": "ok", "data": {"value": 100, "isLow": 0}},
+    }
+    event_bus.subscribe(BatteryEvent, AsyncMock())
+    command = GetBattery()
+
+    result = await command.execute(
+        authenticator, api_device_info, event_bus, mqtt_client=mqtt_client
+    )
+    await asyncio.sleep(0.1)
+
+    assert result.device_reached
+    mqtt_client.execute_p2p_command.assert_awaited_once()
+    assert mqtt_client.execute_p2p_command.call_args.args[:2] == (
+        api_device_info,
+        "getBattery",
+    )
+    authenticator.post_authenticated.assert_not_called()
+    assert event_bus.get_last_event(BatteryEvent) == BatteryEvent(100)
+    metadata = event_bus.get_last_event_metadata(BatteryEvent)
+    assert metadata is not None
+    assert metadata.source == EventSource.P2P
+
+
+async def test_execute_mqtt_p2p_fallback(
+    authenticator: Mock, api_device_info: ApiDeviceInfo, event_bus: EventBus
+) -> None:
+    """Test that the command falls back to rest if the p2p request was not published."""
+    mqtt_client = AsyncMock(spec=MqttClient)
+    mqtt_client.execute_p2p_command.side_effect = MqttError("Device not subscribed")
+
+    await GetBattery().execute(
+        authenticator, api_device_info, event_bus, mqtt_client=mqtt_client
+    )
+
+    mqtt_client.execute_p2p_command.assert_awaited_once()
+    authenticator.post_authenticated.assert_awaited_once()
+
+
+async def test_execute_mqtt_p2p_timeout(
+    caplog: pytest.LogCaptureFixture,
+    authenticator: Mock,
+    api_device_info: ApiDeviceInfo,
+    event_bus: EventBus,
+) -> None:
+    """Test that a published p2p request is not sent again over rest on timeout."""
+    mqtt_client = AsyncMock(spec=MqttClient)
+    mqtt_client.execute_p2p_command.side_effect = TimeoutError
+
+    result = await PlaySound().execute(
+        authenticator, api_device_info, event_bus, mqtt_client=mqtt_client
+    )
+
+    assert not result.device_reached
+    authenticator.post_authenticated.assert_not_called()
+    assert (
+        "deebot_client.command",
+        logging.WARNING,
+        "Could not execute command playSound: Timeout reached",
+    ) in caplog.record_tuples
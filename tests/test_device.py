@@ -8,6 +8,8 @@ from unittest.mock import Mock, patch
 
 from deebot_client.command import DeviceCommandResult
 from deebot_client.commands.json.battery import GetBattery
+from deebot_client.commands.json.custom import CustomCommand
+from deebot_client.commands.json.play_sound import PlaySound
 from deebot_client.device import Device
 from deebot_client.events import AvailabilityEvent
 from deebot_client.events.network import NetworkInfoEvent
@@ -133,3 +135,80 @@ async def test_mac_address(
 
     assert device.mac == mac
     await device.teardown()
+
+
+async def test_execute_identical_commands_once(
+    authenticator: Authenticator, device_info: DeviceInfo
+) -> None:
+    """Test that identical commands in flight are executed only once."""
+    device = Device(device_info, authenticator)
+    release = asyncio.Event()
+
+    async def execute(*_: object, **__: object) -> DeviceCommandResult:
+        await release.wait()
+        return DeviceCommandResult(device_reached=True, raw_response={"id": 1})
+
+    with patch.object(GetBattery, "execute", side_effect=execute) as execute_mock:
+        waiters = [
+            asyncio.create_task(device.execute_command(GetBattery())) for _ in range(3)
+        ]
+        await asyncio.sleep(0.1)
+        # a cancelled waiter doesn't cancel the shared execution
+        waiters[0].cancel()
+        release.set()
+        results = await asyncio.gather(*waiters[1:])
+
+        assert results == [{"id": 1}, {"id": 1}]
+        execute_mock.assert_called_once()
+        assert not device._commands_in_flight
+
+        # executed again after the previous one has finished
+        await device.execute_command(GetBattery())
+        assert execute_mock.call_count == 2
+
+    await device.teardown()
+
+
+async def test_execute_non_get_commands_always(
+    authenticator: Authenticator, device_info: DeviceInfo
+) -> None:
+    """Test that commands with side effects are never merged."""
+    device = Device(device_info, authenticator)
+    release = asyncio.Event()
+
+    async def execute(*_: object, **__: object) -> DeviceCommandResult:
+        await release.wait()
+        return DeviceCommandResult(device_reached=True)
+
+    with patch.object(PlaySound, "execute", side_effect=execute) as execute_mock:
+        waiters = [
+            asyncio.create_task(device.execute_command(PlaySound())) for _ in range(2)
+        ]
+        await asyncio.sleep(0.1)
+        release.set()
+        await asyncio.gather(*waiters)
+
+        assert execute_mock.call_count == 2
+        assert not device._commands_in_flight
+
+    await device.teardown()
+
+
+async def test_execute_command_changing_args(
+    authenticator: Authenticator, device_info: DeviceInfo
+) -> None:
+    """Test that a command changing its args while executing is not leaked."""
+    device = Device(device_info, authenticator)
+    command = CustomCommand("getTest", {"act": "start"})
+    key = command.get_in_flight_key()
+
+    async def execute(*_: object, **__: object) -> DeviceCommandResult:
+        command._args = {"act": "resume"}
+        return DeviceCommandResult(device_reached=True)
+
+    with patch.object(CustomCommand, "execute", side_effect=execute):
+        await device.execute_command(command)
+
+    assert command.get_in_flight_key() != key
+    assert key not in device._commands_in_flight
+    await device.teardown()
@@ -2,21 +2,37 @@ from __future__ import annotations
 
 import asyncio
 from datetime import UTC, datetime
+from functools import partial
 from typing import TYPE_CHECKING
-from unittest.mock import AsyncMock, call, patch
+from unittest.mock import ANY, AsyncMock, Mock, call, patch
 
 import pytest
 
-from deebot_client.events import AvailabilityEvent, BatteryEvent, StateEvent
+from deebot_client.event_bus import (
+    DebounceMode,
+    EventBus,
+    EventSource,
+    StreamOverflow,
+    _Debouncer,
+    event_source,
+)
+from deebot_client.events import (
+    AvailabilityEvent,
+    BatteryEvent,
+    StateEvent,
+    TotalStatsEvent,
+)
 from deebot_client.events.map import MapChangedEvent
 from deebot_client.events.water_info import WaterInfoEvent
+from deebot_client.metrics import Counter, Duration, Histogram, MetricsSink
 from deebot_client.models import State
 
 if TYPE_CHECKING:
     from collections.abc import Callable
 
-    from deebot_client.event_bus import EventBus
+    from deebot_client.command import Command
     from deebot_client.events.base import Event
+    from deebot_client.models import DeviceInfo
 
 
 def _verify_event_command_called(
@@ -71,6 +87,7 @@ async def test_subscription(
     await _subscribeAndVerify(execute_mock, event_bus, event, expected_call=True)
 
 
+@patch("deebot_client.event_bus._RECOVERY_REFRESH_MAX_JITTER", 0)
 async def test_refresh_when_coming_back_online(
     execute_mock: AsyncMock, event_bus: EventBus
 ) -> None:
@@ -180,37 +197,108 @@ async def test_debounce_time(event_bus: EventBus, debounce_time: float) -> None:
     mock = AsyncMock()
     event_bus.subscribe(MapChangedEvent, mock)
 
-    with patch("deebot_client.event_bus.asyncio", wraps=asyncio) as aio:
+    async def test_cycle(*, call_expected: bool) -> MapChangedEvent:
+        event = MapChangedEvent(datetime.now(UTC))
+        await notify(event, debounce_time)
+        if call_expected:
+            mock.assert_called_once_with(event)
+            mock.reset_mock()
+        else:
+            mock.assert_not_called()
+
+        return event
+
+    sleep_time = debounce_time / 3 if debounce_time > 0 else 0
+
+    for i in range(2):
+        if i > 0:
+            await asyncio.sleep(debounce_time)
+        await test_cycle(call_expected=True)
+        await asyncio.sleep(sleep_time)
+        event = await test_cycle(call_expected=debounce_time <= 0)
+        await asyncio.sleep(sleep_time)
+        event = await test_cycle(call_expected=debounce_time <= 0)
+
+        if debounce_time > 0:
+            await asyncio.sleep(debounce_time)
+            mock.assert_called_once_with(event)
+            mock.reset_mock()
+
+
+@pytest.mark.parametrize(
+    ("mode", "expected"),
+    [
+        (DebounceMode.LEADING, [0]),
+        (DebounceMode.TRAILING, [3]),
+        (DebounceMode.BOTH, [0, 3]),
+    ],
+)
+async def test_debounce_mode(
+    event_bus: EventBus, mode: DebounceMode, expected: list[int]
+) -> None:
+    mock = Mock()
+    event_bus.subscribe(BatteryEvent, mock)
+    await asyncio.sleep(0.1)
+
+    for value in range(4):
+        event_bus.notify(BatteryEvent(value), debounce_time=0.2, debounce_mode=mode)
+        await asyncio.sleep(0.05)
 
-        async def test_cycle(*, call_expected: bool) -> MapChangedEvent:
-            event = MapChangedEvent(datetime.now(UTC))
-            await notify(event, debounce_time)
-            if call_expected:
-                aio.get_running_loop.assert_not_called()
-                mock.assert_called_once_with(event)
-                mock.reset_mock()
-            else:
-                aio.get_running_loop.assert_called()
-                aio.get_running_loop.reset_mock()
-                mock.assert_not_called()
+    await asyncio.sleep(0.3)
+    assert mock.call_args_list == [call(BatteryEvent(value)) for value in expected]
 
-            return event
 
-        sleep_time = debounce_time / 3 if debounce_time > 0 else 0
+async def test_debounce_single_timer(event_bus: EventBus) -> None:
+    mock = Mock()
+    event_bus.subscribe(BatteryEvent, mock)
+    event_bus.subscribe(MapChangedEvent, mock)
+    await asyncio.sleep(0.1)
 
-        for i in range(2):
-            if i > 0:
-                await asyncio.sleep(debounce_time)
-            await test_cycle(call_expected=True)
-            await asyncio.sleep(sleep_time)
-            event = await test_cycle(call_expected=debounce_time <= 0)
-            await asyncio.sleep(sleep_time)
-            event = await test_cycle(call_expected=debounce_time <= 0)
+    event_bus.notify(BatteryEvent(0), debounce_time=0.2)
+    battery = BatteryEvent(1)
+    event_bus.notify(battery, debounce_time=0.2)
+    handle = event_bus._debouncer._handle
+    assert handle is not None
 
-            if debounce_time > 0:
-                await asyncio.sleep(debounce_time)
-                mock.assert_called_once_with(event)
-                mock.reset_mock()
+    # postponing and later deadlines don't replace the timer
+    map_changed = MapChangedEvent(datetime.now(UTC))
+    event_bus.notify(map_changed, debounce_time=0.3)
+    event_bus.notify(BatteryEvent(2), debounce_time=0.2)
+    event_bus.notify(battery, debounce_time=0.2)
+    assert event_bus._debouncer._handle is handle
+
+    await asyncio.sleep(0.35)
+    assert mock.call_args_list == [
+        call(BatteryEvent(0)),
+        call(map_changed),
+        call(battery),
+    ]
+    assert event_bus._debouncer._handle is None
+
+
+async def test_debouncer_callback_error(caplog: pytest.LogCaptureFixture) -> None:
+    debouncer = _Debouncer()
+    now = asyncio.get_running_loop().time()
+    discarded = Mock()
+    later = Mock()
+
+    def failing() -> None:
+        debouncer.discard("discarded")
+        raise RuntimeError("Some error")
+
+    debouncer.schedule("failing", now + 0.05, failing)
+    debouncer.schedule("discarded", now + 0.05, discarded)
+    debouncer.schedule("later", now + 0.15, later)
+
+    await asyncio.sleep(0.1)
+    assert "Error in debounced callback" in caplog.text
+    discarded.assert_not_called()
+    # the timer is set again for the remaining callback
+    assert debouncer._handle is not None
+
+    await asyncio.sleep(0.1)
+    later.assert_called_once()
+    assert debouncer._handle is None
 
 
 async def test_teardown(event_bus: EventBus, execute_mock: AsyncMock) -> None:
@@ -227,12 +315,11 @@ async def test_teardown(event_bus: EventBus, execute_mock: AsyncMock) -> None:
     event_bus.request_refresh(BatteryEvent)
 
     # verify tasks/handle still running
-    handle = event_bus._event_processing_dict[BatteryEvent].notify_handle
-    assert handle is None
+    assert not event_bus._debouncer._pending
     assert len(event_bus._tasks) > 0
 
     event_bus.notify(BatteryEvent(100), debounce_time=10000)
-    handle = event_bus._event_processing_dict[BatteryEvent].notify_handle
+    handle = event_bus._debouncer._handle
     assert handle is not None
     assert handle.cancelled() is False
 
@@ -240,7 +327,433 @@ async def test_teardown(event_bus: EventBus, execute_mock: AsyncMock) -> None:
     await event_bus.teardown()
 
     # verify
-    handle = event_bus._event_processing_dict[BatteryEvent].notify_handle
-    assert handle is not None
     assert handle.cancelled() is True
+    assert not event_bus._debouncer._pending
     assert len(event_bus._tasks) == 0
+
+
+async def test_sync_subscriber(event_bus: EventBus) -> None:
+    def raise_error(_: BatteryEvent) -> None:
+        raise ValueError
+
+    mock = Mock()
+    event_bus.subscribe(BatteryEvent, raise_error)
+    event_bus.subscribe(BatteryEvent, mock)
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+
+    # called inline without creating a task
+    mock.assert_called_once_with(event)
+    assert len(event_bus._tasks) == 0
+
+
+async def test_subscriber_returning_coroutine(event_bus: EventBus) -> None:
+    """Test that callbacks returning a coroutine without being async are awaited."""
+    received: list[BatteryEvent] = []
+
+    async def handler(event: BatteryEvent) -> None:
+        received.append(event)
+
+    class Handler:
+        async def __call__(self, event: BatteryEvent) -> None:
+            received.append(event)
+
+    event_bus.subscribe(BatteryEvent, lambda event: handler(event))
+    event_bus.subscribe(BatteryEvent, partial(handler))
+    event_bus.subscribe(BatteryEvent, Handler())
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+    await asyncio.sleep(0.1)
+
+    assert received == [event, event, event]
+
+
+async def test_listener_error(
+    event_bus: EventBus, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that a raising listener doesn't prevent the delivery to others."""
+
+    def raise_error(_: Event) -> None:
+        raise ValueError
+
+    listener = Mock()
+    subscriber = Mock()
+    event_bus.add_listener(raise_error)
+    event_bus.add_listener(listener)
+    event_bus.subscribe(BatteryEvent, subscriber)
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+
+    listener.assert_called_once_with(event)
+    subscriber.assert_called_once_with(event)
+    assert "Error in listener for" in caplog.text
+
+
+@pytest.mark.parametrize("filter_arg", ["predicate", "key"])
+async def test_subscriber_filter_error(
+    event_bus: EventBus, caplog: pytest.LogCaptureFixture, filter_arg: str
+) -> None:
+    """Test that a raising predicate or key only skips its own subscriber."""
+
+    def raise_error(_: BatteryEvent) -> bool:
+        raise ValueError
+
+    failing = Mock()
+    subscriber = Mock()
+    if filter_arg == "predicate":
+        event_bus.subscribe(BatteryEvent, failing, predicate=raise_error)
+    else:
+        event_bus.subscribe(BatteryEvent, failing, key=raise_error)
+    event_bus.subscribe(BatteryEvent, subscriber)
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+
+    failing.assert_not_called()
+    subscriber.assert_called_once_with(event)
+    assert "Error in filter of subscriber for" in caplog.text
+
+
+async def test_ordered_subscriber(event_bus: EventBus) -> None:
+    received: list[int] = []
+
+    async def callback(event: BatteryEvent) -> None:
+        # later events would overtake earlier ones without ordering
+        await asyncio.sleep(0.01 * (100 - event.value))
+        received.append(event.value)
+
+    event_bus.subscribe(BatteryEvent, callback, ordered=True)
+    await asyncio.sleep(0.1)
+
+    for value in (10, 50, 90):
+        event_bus.notify(BatteryEvent(value))
+
+    # only one worker is processing all events
+    assert len(event_bus._tasks) == 1
+    await asyncio.sleep(2)
+    assert received == [10, 50, 90]
+    assert event_bus._event_processing_dict[BatteryEvent].ordered_worker is None
+
+
+async def test_subscribe_predicate_and_key(event_bus: EventBus) -> None:
+    mock = Mock()
+    event_bus.subscribe(
+        BatteryEvent,
+        mock,
+        predicate=lambda event: event.value > 0,
+        key=lambda event: event.value >= 20,
+    )
+    await asyncio.sleep(0.1)
+
+    for value in (0, 100, 80, 10, 5, 0, 30):
+        event_bus.notify(BatteryEvent(value))
+
+    assert mock.call_args_list == [
+        call(BatteryEvent(100)),
+        call(BatteryEvent(10)),
+        call(BatteryEvent(30)),
+    ]
+
+
+async def test_subscribe_max_rate(event_bus: EventBus) -> None:
+    mock = Mock()
+    unsubscribe = event_bus.subscribe(BatteryEvent, mock, max_rate=5)
+    await asyncio.sleep(0.1)
+
+    for value in range(4):
+        event_bus.notify(BatteryEvent(value))
+    assert mock.call_args_list == [call(BatteryEvent(0))]
+
+    # latest event is passed after the interval
+    await asyncio.sleep(0.25)
+    assert mock.call_args_list == [call(BatteryEvent(0)), call(BatteryEvent(3))]
+
+    event_bus.notify(BatteryEvent(4))
+    unsubscribe()
+    await asyncio.sleep(0.25)
+    assert mock.call_count == 2
+    assert not event_bus._debouncer._pending
+
+
+async def test_subscribe_invalid_max_rate(event_bus: EventBus) -> None:
+    with pytest.raises(ValueError, match="max_rate must be greater than 0"):
+        event_bus.subscribe(BatteryEvent, Mock(), max_rate=0)
+
+
+@pytest.mark.parametrize(
+    ("overflow", "expected"),
+    [
+        (StreamOverflow.DROP_OLDEST, [2, 3, 4]),
+        ("coalesce", [0, 1, 4]),
+        (StreamOverflow.BLOCK, [0, 1, 2, 3, 4]),
+    ],
+)
+async def test_stream(
+    event_bus: EventBus, overflow: StreamOverflow | str, expected: list[int]
+) -> None:
+    stream = event_bus.stream(BatteryEvent, maxsize=3, overflow=overflow)
+    await asyncio.sleep(0.1)
+
+    for value in range(5):
+        event_bus.notify(BatteryEvent(value))
+    await asyncio.sleep(0.1)
+
+    received = []
+    async for event in stream:
+        received.append(event.value)
+        if event.value == 4:
+            break
+
+    assert received == expected
+    assert stream.dropped == 5 - len(expected)
+
+    stream.close()
+    assert stream.closed
+    assert not event_bus.has_subscribers(BatteryEvent)
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+
+
+async def test_stream_block_bounded(event_bus: EventBus) -> None:
+    """Test that a blocked stream holds a bounded number of events and blocks no one else."""
+    received: list[int] = []
+
+    async def callback(event: BatteryEvent) -> None:
+        received.append(event.value)
+
+    stream = event_bus.stream(BatteryEvent, maxsize=1, overflow=StreamOverflow.BLOCK)
+    event_bus.subscribe(BatteryEvent, callback, ordered=True)
+    await asyncio.sleep(0.1)
+
+    for value in range(5):
+        event_bus.notify(BatteryEvent(value))
+    await asyncio.sleep(0.1)
+
+    # other ordered subscribers are not stalled by the blocked stream
+    assert received == [0, 1, 2, 3, 4]
+    # one event is buffered, one held and the others are dropped
+    assert stream.dropped == 3
+    assert (await anext(stream)).value == 0
+    assert (await anext(stream)).value == 4
+
+    stream.close()
+
+
+async def test_stream_closed_on_teardown(event_bus: EventBus) -> None:
+    async with event_bus.stream(BatteryEvent) as stream:
+        received = []
+
+        async def consume() -> None:
+            received.extend([event async for event in stream])
+
+        task = asyncio.create_task(consume())
+        event_bus.notify(BatteryEvent(100))
+        await asyncio.sleep(0.1)
+
+        await event_bus.teardown()
+        await task
+        assert received == [BatteryEvent(100)]
+        assert stream.closed
+
+
+async def test_stream_invalid_maxsize(event_bus: EventBus) -> None:
+    with pytest.raises(ValueError, match="maxsize must be greater than 0"):
+        event_bus.stream(BatteryEvent, maxsize=0)
+
+
+@patch("deebot_client.event_bus._MAX_CONCURRENT_RECOVERY_REFRESHES", 1)
+@patch("deebot_client.event_bus._RECOVERY_REFRESH_MAX_JITTER", 0)
+async def test_recovery_refresh_stages(
+    execute_mock: AsyncMock, event_bus: EventBus
+) -> None:
+    event_types = [TotalStatsEvent, WaterInfoEvent, BatteryEvent, StateEvent]
+    for event_type in event_types:
+        event_bus.subscribe(event_type, AsyncMock())
+    event_bus.notify(AvailabilityEvent(available=False))
+    await asyncio.sleep(0.1)
+
+    running = 0
+    max_running = 0
+    executed = []
+
+    async def execute(command: Command) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        executed.append(command)
+        running -= 1
+
+    execute_mock.side_effect = execute
+    event_bus.notify(AvailabilityEvent(available=True))
+    await asyncio.sleep(0.5)
+
+    # only the commands of a single event type are executed concurrently
+    state_commands = event_bus._get_refresh_commands(StateEvent)
+    assert max_running == len(state_commands)
+    assert all(command in state_commands for command in executed[: len(state_commands)])
+    assert executed[len(state_commands) :] == [
+        command
+        for event_type in (BatteryEvent, WaterInfoEvent, TotalStatsEvent)
+        for command in event_bus._get_refresh_commands(event_type)
+    ]
+
+
+@patch("deebot_client.event_bus._RECOVERY_REFRESH_MAX_JITTER", 0)
+async def test_recovery_refresh_error(
+    execute_mock: AsyncMock, event_bus: EventBus, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that failed recovery refreshes are logged and later stages still run."""
+    event_bus.subscribe(BatteryEvent, AsyncMock())
+    event_bus.subscribe(TotalStatsEvent, AsyncMock())
+    event_bus.notify(AvailabilityEvent(available=False))
+    await asyncio.sleep(0.1)
+
+    battery_commands = event_bus._get_refresh_commands(BatteryEvent)
+
+    async def execute(command: Command) -> None:
+        if command in battery_commands:
+            raise ValueError
+
+    execute_mock.side_effect = execute
+    execute_mock.reset_mock()
+    event_bus.notify(AvailabilityEvent(available=True))
+    await asyncio.sleep(0.1)
+
+    assert "Recovery refresh of BatteryEvent failed" in caplog.text
+    for command in event_bus._get_refresh_commands(TotalStatsEvent):
+        execute_mock.assert_any_call(command)
+
+
+async def test_last_event_metadata(event_bus: EventBus) -> None:
+    assert event_bus.get_last_event_metadata(BatteryEvent) is None
+
+    with event_source(EventSource.MQTT):
+        event_bus.notify(BatteryEvent(100))
+    metadata = event_bus.get_last_event_metadata(BatteryEvent)
+    assert metadata is not None
+    assert metadata.source == EventSource.MQTT
+    assert abs((datetime.now(UTC) - metadata.received_at).total_seconds()) < 1
+
+    await asyncio.sleep(0.2)
+    assert event_bus.get_last_event(BatteryEvent, max_age=0.1) is None
+    assert event_bus.get_last_event(BatteryEvent, max_age=1) == BatteryEvent(100)
+
+    # an identical event refreshes the metadata
+    event_bus.notify(BatteryEvent(100))
+    new_metadata = event_bus.get_last_event_metadata(BatteryEvent)
+    assert new_metadata is not None
+    assert new_metadata.source == EventSource.UNKNOWN
+    assert new_metadata.age < metadata.age
+    assert event_bus.get_last_event(BatteryEvent, max_age=0.1) == BatteryEvent(100)
+
+
+async def test_get_or_refresh(execute_mock: AsyncMock, event_bus: EventBus) -> None:
+    async def execute(_: Command) -> None:
+        with event_source(EventSource.REST):
+            event_bus.notify(BatteryEvent(80))
+
+    execute_mock.side_effect = execute
+    event_bus.notify(BatteryEvent(100))
+
+    assert await event_bus.get_or_refresh(BatteryEvent, 10) == BatteryEvent(100)
+    execute_mock.assert_not_called()
+
+    await asyncio.sleep(0.1)
+    assert await event_bus.get_or_refresh(BatteryEvent, 0.05) == BatteryEvent(80)
+    execute_mock.assert_called_once()
+    metadata = event_bus.get_last_event_metadata(BatteryEvent)
+    assert metadata is not None
+    assert metadata.source == EventSource.REST
+
+    # refresh without a new event
+    execute_mock.side_effect = None
+    await asyncio.sleep(0.1)
+    assert await event_bus.get_or_refresh(BatteryEvent, 0.05) is None
+
+
+async def test_metrics(execute_mock: AsyncMock, device_info: DeviceInfo) -> None:
+    sink = Mock(spec_set=MetricsSink)
+    event_bus = EventBus(
+        execute_mock,
+        device_info.static.capabilities.get_refresh_commands,
+        metrics_sink=sink,
+    )
+    event_bus.subscribe(BatteryEvent, AsyncMock())
+    event_bus.subscribe(BatteryEvent, Mock())
+    await asyncio.sleep(0.1)
+
+    event_bus.notify(BatteryEvent(100))
+    event_bus.notify(BatteryEvent(100))
+    event_bus.notify(BatteryEvent(90), debounce_time=1)
+    event_bus.notify(BatteryEvent(80), debounce_time=1)
+    await asyncio.sleep(0.1)
+
+    snapshot = event_bus.get_metrics_snapshot()
+    metrics = snapshot.events[BatteryEvent]
+    assert metrics.counters == {
+        Counter.NOTIFIED: 4,
+        Counter.DEDUPLICATED: 1,
+        Counter.DEBOUNCED: 1,
+        Counter.DELIVERED: 4,
+    }
+    assert metrics.durations[Duration.CALLBACK].count == 4
+    assert metrics.durations[Duration.REFRESH].count == 1
+    assert snapshot.tasks == 0
+
+    # snapshot is not changed afterwards
+    event_bus.notify(BatteryEvent(70))
+    assert metrics.counters[Counter.NOTIFIED] == 4
+
+    sink.increment.assert_any_call(BatteryEvent, Counter.DEDUPLICATED)
+    sink.observe.assert_any_call(BatteryEvent, Duration.REFRESH, ANY)
+    await event_bus.teardown()
+
+
+async def test_metrics_sink_error(
+    execute_mock: AsyncMock,
+    device_info: DeviceInfo,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test that a broken metrics sink doesn't affect the event delivery."""
+    sink = Mock(spec_set=MetricsSink)
+    sink.increment.side_effect = ValueError
+    sink.observe.side_effect = ValueError
+    event_bus = EventBus(
+        execute_mock,
+        device_info.static.capabilities.get_refresh_commands,
+        metrics_sink=sink,
+    )
+    mock = Mock()
+    event_bus.subscribe(BatteryEvent, mock)
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+
+    mock.assert_called_once_with(event)
+    assert (
+        event_bus.get_metrics_snapshot()
+        .events[BatteryEvent]
+        .counters[Counter.DELIVERED]
+        == 1
+    )
+    assert "Error in metrics sink" in caplog.text
+    await event_bus.teardown()
+
+
+def test_histogram() -> None:
+    histogram = Histogram()
+    for value in (0.0005, 0.001, 0.02, 100):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(100.0215)
+    assert histogram.buckets == [2, 0, 0, 1, 0, 0, 0, 0, 0, 1]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from deebot_client.event_history import EventHistory
+from deebot_client.events import BatteryEvent, Position, PositionsEvent, PositionType
+
+if TYPE_CHECKING:
+    from deebot_client.event_bus import EventBus
+
+
+def test_ring_buffer() -> None:
+    history = EventHistory[BatteryEvent](["value"], capacity=3)
+    assert history.fields == ("value",)
+
+    timestamps, values = history.to_numpy()
+    assert timestamps.size == 0
+    assert values["value"].size == 0
+
+    for i in range(5):
+        history.append(BatteryEvent(i * 10), timestamp=100 + i)
+
+    assert len(history) == 3
+    timestamps, values = history.to_numpy()
+    np.testing.assert_array_equal(timestamps, [102, 103, 104])
+    np.testing.assert_array_equal(values["value"], [20, 30, 40])
+
+    timestamps, values = history.to_numpy(since=103)
+    np.testing.assert_array_equal(timestamps, [103, 104])
+    np.testing.assert_array_equal(values["value"], [30, 40])
+
+    history.clear()
+    assert len(history) == 0
+
+
+def test_invalid_arguments() -> None:
+    with pytest.raises(ValueError, match="capacity must be greater than 0"):
+        EventHistory[BatteryEvent](["value"], capacity=0)
+    with pytest.raises(ValueError, match="At least one field is required"):
+        EventHistory[BatteryEvent]([], capacity=1)
+
+
+async def test_event_bus_history(event_bus: EventBus) -> None:
+    def get_deebot(event: PositionsEvent) -> Position:
+        return next(
+            (p for p in event.positions if p.type == PositionType.DEEBOT),
+            Position(PositionType.DEEBOT, 0, 0, 0),
+        )
+
+    assert event_bus.get_history(PositionsEvent) is None
+    history = event_bus.enable_history(
+        PositionsEvent,
+        {"x": lambda e: get_deebot(e).x, "y": lambda e: get_deebot(e).y},
+        capacity=10,
+    )
+    assert event_bus.get_history(PositionsEvent) is history
+
+    for x, y in ((1, 2), (1, 2), (3, 4)):
+        event_bus.notify(PositionsEvent([Position(PositionType.DEEBOT, x, y, 0)]))
+
+    # identical events are skipped
+    timestamps, values = history.to_numpy()
+    assert timestamps.size == 2
+    assert np.all(np.diff(timestamps) >= 0)
+    np.testing.assert_array_equal(values["x"], [1, 3])
+    np.testing.assert_array_equal(values["y"], [2, 4])
+
+
+async def test_event_bus_history_error(
+    event_bus: EventBus, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that an error recording the history doesn't prevent the delivery."""
+    event_bus.enable_history(BatteryEvent, {"value": lambda e: e.value / 0})
+    mock = Mock()
+    event_bus.subscribe(BatteryEvent, mock)
+    await asyncio.sleep(0.1)
+
+    event = BatteryEvent(100)
+    event_bus.notify(event)
+
+    mock.assert_called_once_with(event)
+    assert "Error recording history of" in caplog.text
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, Mock, call
+
+from deebot_client.event_bus import EventBus
+from deebot_client.event_hub import EventHub
+from deebot_client.events import AvailabilityEvent, BatteryEvent, ErrorEvent
+
+if TYPE_CHECKING:
+    from deebot_client.models import DeviceInfo
+
+
+async def test_event_hub(execute_mock: AsyncMock, device_info: DeviceInfo) -> None:
+    get_refresh_commands = device_info.static.capabilities.get_refresh_commands
+    bus_1 = EventBus(execute_mock, get_refresh_commands)
+    bus_2 = EventBus(execute_mock, get_refresh_commands)
+    hub = EventHub()
+    hub.add_event_bus("did_1", bus_1)
+    remove_bus_2 = hub.add_event_bus("did_2", bus_2)
+
+    all_events = Mock()
+    battery_events = AsyncMock()
+    did_2_events = Mock()
+    hub.subscribe(all_events)
+    hub.subscribe(battery_events, event_types=[BatteryEvent])
+    unsubscribe = hub.subscribe(did_2_events, dids=["did_2"])
+
+    bus_1.notify(BatteryEvent(100))
+    bus_2.notify(BatteryEvent(50))
+    bus_2.notify(BatteryEvent(50))
+    bus_2.notify(AvailabilityEvent(available=True))
+    await asyncio.sleep(0.1)
+
+    # one call per batch
+    all_events.assert_called_once_with(
+        [
+            ("did_1", BatteryEvent(100)),
+            ("did_2", BatteryEvent(50)),
+            ("did_2", AvailabilityEvent(available=True)),
+        ]
+    )
+    battery_events.assert_awaited_once_with(
+        [("did_1", BatteryEvent(100)), ("did_2", BatteryEvent(50))]
+    )
+    did_2_events.assert_called_once_with(
+        [("did_2", BatteryEvent(50)), ("did_2", AvailabilityEvent(available=True))]
+    )
+
+    all_events.reset_mock()
+    did_2_events.reset_mock()
+    unsubscribe()
+    remove_bus_2()
+    bus_1.notify(ErrorEvent(1, "error"))
+    bus_2.notify(ErrorEvent(2, "error"))
+    await asyncio.sleep(0.1)
+
+    all_events.assert_called_once_with([("did_1", ErrorEvent(1, "error"))])
+    did_2_events.assert_not_called()
+    battery_events.assert_awaited_once()
+
+    await hub.teardown()
+
+
+async def test_event_hub_batch_interval(event_bus: EventBus) -> None:
+    hub = EventHub(batch_interval=0.2)
+    hub.add_event_bus("did", event_bus)
+    mock = Mock()
+    hub.subscribe(mock)
+
+    event_bus.notify(BatteryEvent(100))
+    await asyncio.sleep(0.1)
+    event_bus.notify(BatteryEvent(90))
+    mock.assert_not_called()
+
+    await asyncio.sleep(0.2)
+    assert mock.call_args_list == [
+        call([("did", BatteryEvent(100)), ("did", BatteryEvent(90))])
+    ]
+
+    event_bus.notify(BatteryEvent(80))
+    await hub.teardown()
+    await asyncio.sleep(0.3)
+    assert mock.call_count == 1
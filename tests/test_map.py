@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING
+from io import BytesIO
+import struct
+from typing import TYPE_CHECKING, Any
 from unittest.mock import ANY, AsyncMock, Mock, call, patch
+import zlib
 
+import numpy as np
+from PIL import Image
 import pytest
 from svg import (
     ArcRel,
@@ -22,6 +27,7 @@ from svg import (
     ViewBoxSpec,
 )
 
+from deebot_client.commands.json import GetMinorMap
 from deebot_client.events.map import (
     MajorMapEvent,
     MapChangedEvent,
@@ -34,25 +40,36 @@ from deebot_client.events.map import (
     PositionsEvent,
     PositionType,
 )
+from deebot_client.exceptions import MapError
 from deebot_client.map import (
+    _MAP_BACKGROUND_COLORS,
     Map,
     MapData,
+    MapPiece,
     Path,
     Point,
     TracePoint,
+    TracePoints,
     ViewBoxFloat,
+    _adler32_combine,
     _calc_point,
     _calc_point_in_viewbox,
+    _encode_band,
+    _encode_path_data,
     _get_svg_positions,
     _get_svg_subset,
+    _IncrementalTracePath,
     _points_to_svg_path,
+    _SerializedPathData,
 )
+from deebot_client.map_cache import DirectoryMapPieceCache
 from deebot_client.models import Room
 
 from .common import block_till_done
 
 if TYPE_CHECKING:
     from collections.abc import Sequence
+    import pathlib
 
     from deebot_client.event_bus import EventBus
 
@@ -181,10 +198,378 @@ async def test_Map_svg_traces_path(
         transform=[
             Scale(0.2, -0.2),
         ],
-        d=[MoveTo(x=16, y=256)],
+        d=[_SerializedPathData("M16 256")],
     )
 
 
+async def test_Map_svg_traces_path_incremental(
+    execute_mock: AsyncMock, event_bus_mock: Mock
+) -> None:
+    map = Map(execute_mock, event_bus_mock)
+    points = [
+        (0, 0, 0),
+        (0, 0, 0),
+        (3, -3, 0),
+        (2, -3, 0),
+        (-12, -2, 0),
+        (-12, 0, 0),
+        (-41, 1, 0x80),
+        (-45, -10, 0),
+        (-45, -10, 0),
+        (-40, -10, 0),
+        (-35, -10, 0),
+    ]
+    data = b"".join(struct.pack("<hhB", *point) for point in points)
+
+    def expected_path_data(amount: int) -> str:
+        return Path.path_data_as_str(
+            _points_to_svg_path(map._map_data.trace_values[:amount])
+        )
+
+    # chunk boundaries between identical points and identical commands
+    for start, end in ((0, 2), (2, 3), (3, 8), (8, 10), (10, 11)):
+        with patch(
+            "deebot_client.map.decompress_7z_base64_data",
+            Mock(return_value=data[start * 5 : end * 5]),
+        ):
+            map._update_trace_points("")
+
+        path = map._get_svg_traces_path()
+        assert path is not None
+        assert path.d == [_SerializedPathData(expected_path_data(end))]
+
+    assert expected_path_data(11) == "M0 0l3-3h-1l-14 1v2m-29 1l-4-11h5 5"
+
+    map._map_data.trace_values.clear()
+    map._trace_path.reset()
+    with patch(
+        "deebot_client.map.decompress_7z_base64_data",
+        Mock(return_value=data[15:25]),
+    ):
+        map._update_trace_points("")
+    path = map._get_svg_traces_path()
+    assert path is not None
+    assert path.d == [_SerializedPathData("M2-3l-14 1")]
+
+
+async def test_Map_background_image_from_canvas(
+    execute_mock: AsyncMock, event_bus_mock: Mock
+) -> None:
+    map = Map(execute_mock, event_bus_mock)
+    assert map._get_background_image() is None
+
+    # piece 9 is located in the second column and second row of the canvas
+    piece_data = bytearray(100 * 100)
+    piece_data[0:3] = b"\x01\x02\x03"
+    with patch(
+        "deebot_client.map.decompress_7z_base64_data",
+        Mock(return_value=bytes(piece_data)),
+    ):
+        map._map_data.map_pieces[9].update_points("")
+
+    canvas = map._map_data.map_canvas
+    assert canvas[100:103, 100].tolist() == [1, 2, 3]
+    assert canvas.sum() == 6
+
+    background = map._get_background_image()
+    assert background is not None
+    assert background.bounding_box == (100, 100, 101, 103)
+
+    image = Image.open(BytesIO(background.image)).convert("RGBA")
+    assert image.size == (1, 3)
+    # rows are flipped and value 3 (carpet) is drawn on top
+    assert [image.getpixel((0, y)) for y in range(3)] == [
+        (0x1A, 0x81, 0xED, 255),
+        (0x4E, 0x96, 0xE2, 255),
+        (0xBA, 0xDA, 0xFF, 255),
+    ]
+
+    map._map_data.map_pieces[9].crc32_indicates_update(str(MapPiece._NOT_INUSE_CRC32))
+    assert not canvas.any()
+    assert map._get_background_image() is None
+
+
+async def test_Map_background_image_reencodes_changed_bands(
+    execute_mock: AsyncMock, event_bus_mock: Mock
+) -> None:
+    map = Map(execute_mock, event_bus_mock)
+
+    def update_piece(index: int, value: int) -> None:
+        with patch(
+            "deebot_client.map.decompress_7z_base64_data",
+            Mock(return_value=bytes([value]) * 100 * 100),
+        ):
+            map._map_data.map_pieces[index].update_points("")
+
+    # pieces 9 and 10 are in different bands
+    update_piece(9, 1)
+    update_piece(10, 2)
+
+    with patch("deebot_client.map._encode_band", wraps=_encode_band) as encode_band:
+        background = map._get_background_image()
+        assert background is not None
+        assert encode_band.call_count == 2
+
+        encode_band.reset_mock()
+        assert map._get_background_image() == background
+        encode_band.assert_not_called()
+
+        update_piece(10, 3)
+        changed_background = map._get_background_image()
+        assert changed_background is not None
+        encode_band.assert_called_once()
+
+    assert (
+        changed_background.bounding_box
+        == background.bounding_box
+        == (
+            100,
+            100,
+            200,
+            300,
+        )
+    )
+    image = Image.open(BytesIO(changed_background.image)).convert("RGBA")
+    assert image.getpixel((0, 0)) == (0x1A, 0x81, 0xED, 255)
+    assert image.getpixel((0, 199)) == (0xBA, 0xDA, 0xFF, 255)
+
+
+async def test_Map_background_image_size(
+    execute_mock: AsyncMock, event_bus_mock: Mock
+) -> None:
+    """Test that the banded PNG stays close to the size of an optimized PNG."""
+    map = Map(execute_mock, event_bus_mock)
+    rng = np.random.default_rng(1)
+    canvas = map._map_data.map_canvas
+    # rooms with walls, a carpet and scattered obstacles
+    for x1, y1, x2, y2 in ((150, 150, 420, 380), (420, 150, 650, 330)):
+        canvas[y1:y2, x1:x2] = 2
+        canvas[y1 + 2 : y2 - 2, x1 + 2 : x2 - 2] = 1
+    canvas[200:300, 200:320] = 3
+    canvas[tuple(rng.integers(150, 330, (2, 800)))] = 5
+
+    background = map._get_background_image()
+    assert background is not None
+    left, top, right, bottom = (int(value) for value in background.bounding_box)
+    pixels = canvas[top:bottom, left:right][::-1]
+    image = Image.fromarray(pixels, "P")
+    image.putpalette(
+        [channel for color in _MAP_BACKGROUND_COLORS.values() for channel in color]
+    )
+    image.info["transparency"] = 0
+    buffered = BytesIO()
+    image.save(buffered, format="PNG", optimize=True)
+
+    decoded = Image.open(BytesIO(background.image)).convert("RGBA")
+    assert decoded.tobytes() == image.convert("RGBA").tobytes()
+    assert len(background.image) <= len(buffered.getvalue()) * 1.15
+
+
+@pytest.mark.parametrize(
+    ("data1", "data2"),
+    [(b"", b""), (b"abc", b""), (b"", b"xyz"), (b"a" * 7000, b"b" * 70000)],
+)
+def test_adler32_combine(data1: bytes, data2: bytes) -> None:
+    assert _adler32_combine(
+        zlib.adler32(data1), zlib.adler32(data2), len(data2)
+    ) == zlib.adler32(data1 + data2)
+
+
+async def test_Map_svg_map_layer_cache(
+    execute_mock: AsyncMock, event_bus_mock: Mock
+) -> None:
+    map = Map(execute_mock, event_bus_mock)
+    assert map.get_svg_map() is None
+
+    with patch(
+        "deebot_client.map.decompress_7z_base64_data",
+        Mock(return_value=b"\x01" * 100 * 100),
+    ):
+        map._map_data.map_pieces[36].update_points("")
+    map._map_data.map_subsets[0] = MapSubsetEvent(
+        id=0, type=MapSetType.VIRTUAL_WALLS, coordinates="[-3900,668,-2133,668]"
+    )
+    map._map_data.trace_values.append(TracePoint(16, 256, connected=True))
+    map._map_data.positions = [Position(PositionType.DEEBOT, 0, 0, 0)]
+
+    svg_map = map.get_svg_map()
+    assert svg_map is not None
+    assert svg_map.startswith(
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 -100 100 100"><defs >'
+    )
+    assert '<use href="#d" x="0.0" y="0.0"/></svg>' in svg_map
+    assert map.get_svg_map() is svg_map
+
+    with (
+        patch.object(
+            map, "_get_background_image", wraps=map._get_background_image
+        ) as get_background_image,
+        patch(
+            "deebot_client.map._get_svg_subset", wraps=_get_svg_subset
+        ) as get_svg_subset,
+        patch.object(
+            map, "_get_svg_traces_path", wraps=map._get_svg_traces_path
+        ) as get_svg_traces_path,
+    ):
+        map._map_data.positions = [Position(PositionType.DEEBOT, 1000, 1000, 0)]
+        position_svg_map = map.get_svg_map()
+        assert position_svg_map is not None
+        assert position_svg_map.endswith('<use href="#d" x="20.0" y="-20.0"/></svg>')
+        assert (
+            position_svg_map.replace(
+                '<use href="#d" x="20.0" y="-20.0"/>',
+                '<use href="#d" x="0.0" y="0.0"/>',
+            )
+            == svg_map
+        )
+        get_background_image.assert_not_called()
+        get_svg_subset.assert_not_called()
+        get_svg_traces_path.assert_not_called()
+
+        map._map_data.trace_values.append(TracePoint(20, 256, connected=True))
+        assert map.get_svg_map() != position_svg_map
+        get_svg_traces_path.assert_called_once()
+        get_background_image.assert_not_called()
+        get_svg_subset.assert_not_called()
+
+
+async def test_Map_get_image(execute_mock: AsyncMock, event_bus_mock: Mock) -> None:
+    map = Map(execute_mock, event_bus_mock)
+    assert map.get_image() is None
+
+    with patch(
+        "deebot_client.map.decompress_7z_base64_data",
+        Mock(return_value=b"\x01" * 100 * 100),
+    ):
+        map._map_data.map_pieces[36].update_points("")
+    map._map_data.positions = [Position(PositionType.DEEBOT, 2500, 2500, 0)]
+
+    data = map.get_image(scale=2)
+    assert data is not None
+    assert map.get_image(scale=2) is data
+    image = Image.open(BytesIO(data))
+    assert image.format == "PNG"
+    assert image.size == (200, 200)
+    # floor
+    assert image.getpixel((0, 0)) == (0xBA, 0xDA, 0xFF, 255)
+    # bot at 50/50 in map coordinates
+    assert image.getpixel((100, 100)) == (0, 0, 255, 255)
+
+    static_image = map._rasterizer._static_image
+    map._map_data.positions = [Position(PositionType.DEEBOT, 0, 0, 0)]
+    moved = Image.open(BytesIO(map.get_image(scale=2) or b""))
+    assert map._rasterizer._static_image is static_image
+    assert moved.getpixel((100, 100)) == (0xBA, 0xDA, 0xFF, 255)
+
+    thumbnail = Image.open(
+        BytesIO(map.get_image(image_format="webp", max_size=50) or b"")
+    )
+    assert thumbnail.format == "WEBP"
+    assert thumbnail.size == (50, 50)
+
+    # formats without alpha channel are supported as well
+    jpeg = Image.open(BytesIO(map.get_image(image_format="JPEG") or b""))
+    assert jpeg.format == "JPEG"
+    assert jpeg.mode == "RGB"
+    assert jpeg.size == (100, 100)
+
+    with pytest.raises(ValueError, match="must be greater than 0"):
+        map.get_image(scale=0)
+    with pytest.raises(ValueError, match="Unsupported image format: INVALID"):
+        map.get_image(image_format="invalid")
+
+    await map.teardown()
+    with pytest.raises(MapError):
+        map.get_image()
+
+
+def test_TracePoints() -> None:
+    on_change = Mock()
+    trace_points = TracePoints(on_change)
+    assert len(trace_points) == 0
+    assert list(trace_points) == []
+
+    trace_points.extend_from_bytes(
+        struct.pack("<hhB", 16, 256, 0)
+        + struct.pack("<hhB", -215, -70, 0x80)
+        # incomplete record is ignored
+        + b"\x01\x00"
+    )
+    on_change.assert_called_once()
+    assert len(trace_points) == 2
+    assert trace_points[0] == TracePoint(16, 256, connected=True)
+    assert trace_points[-1] == TracePoint(-215, -70, connected=False)
+    assert trace_points.x.tolist() == [16, -215]
+    assert trace_points.y.tolist() == [256, -70]
+    assert trace_points.connected.tolist() == [True, False]
+    with pytest.raises(IndexError):
+        trace_points[2]
+
+    # grow over the initial capacity
+    trace_points.extend_from_bytes(struct.pack("<hhB", 1, 2, 0) * 2000)
+    trace_points.append(TracePoint(3, 4, connected=False))
+    assert len(trace_points) == 2003
+    assert trace_points[1] == TracePoint(-215, -70, connected=False)
+    assert trace_points[1:3] == [
+        TracePoint(-215, -70, connected=False),
+        TracePoint(1, 2, connected=True),
+    ]
+    assert list(trace_points)[-1] == TracePoint(3, 4, connected=False)
+
+    on_change.reset_mock()
+    trace_points.clear()
+    on_change.assert_called_once()
+    assert len(trace_points) == 0
+
+
+async def test_Map_minor_map_fetches(
+    execute_mock: AsyncMock, event_bus: EventBus
+) -> None:
+    map = Map(execute_mock, event_bus)
+    fetch_started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def execute(_: GetMinorMap) -> dict[str, Any]:
+        fetch_started.set()
+        await release.wait()
+        return {}
+
+    event_bus.subscribe(MapChangedEvent, AsyncMock())
+    await block_till_done(event_bus)
+    # bot is located in piece 45
+    event_bus.notify(PositionsEvent([Position(PositionType.DEEBOT, 7500, 7500, 0)]))
+    await block_till_done(event_bus)
+    execute_mock.reset_mock()
+    execute_mock.side_effect = execute
+
+    values = [str(MapPiece._NOT_INUSE_CRC32)] * 64
+    values[0] = values[7] = values[45] = values[63] = "1"
+    event_bus.notify(MajorMapEvent("map", values, requested=True))
+    await fetch_started.wait()
+    # same crc32s again should not trigger any new fetch
+    event_bus.notify(MajorMapEvent("map", list(values), requested=False))
+    event_bus.notify(MajorMapEvent("map", ["2", *values[1:]], requested=True))
+    await asyncio.sleep(0.1)
+
+    fetches = map._minor_map_fetcher._fetches
+    assert set(fetches) == {0, 7, 45, 63}
+    assert fetches[0][0] == ("map", "2")
+
+    release.set()
+    await block_till_done(event_bus)
+    await asyncio.gather(*map._minor_map_fetcher._tasks, return_exceptions=True)
+    assert not fetches
+    assert execute_mock.call_args_list == [
+        call(GetMinorMap(map_id="map", piece_index=45)),
+        call(GetMinorMap(map_id="map", piece_index=63)),
+        call(GetMinorMap(map_id="map", piece_index=7)),
+        # the first fetch of piece 0 was cancelled while waiting
+        call(GetMinorMap(map_id="map", piece_index=0)),
+    ]
+
+    await map.teardown()
+
+
 def test_compact_path() -> None:
     """Test that the path is compacted correctly."""
     path = Path(
@@ -243,6 +628,97 @@ def test_points_to_svg_path(
     assert _points_to_svg_path(points) == expected
 
 
+def _random_trace_points(amount: int) -> list[TracePoint]:
+    rng = np.random.default_rng(42)
+    return [
+        TracePoint(x, y, connected=connected)
+        for x, y, connected in zip(
+            np.cumsum(rng.integers(-3, 4, amount)).tolist(),
+            np.cumsum(rng.integers(-3, 4, amount)).tolist(),
+            (rng.random(amount) > 0.1).tolist(),
+            strict=True,
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "points",
+    [
+        [Point(x=45.58, y=176.12)],
+        [Point(x=45.58, y=176.12), Point(x=18.78, y=175.94)],
+        [Point(x=-0.0, y=-0.0), Point(x=0.1, y=-0.0), Point(x=0.1, y=0.3)],
+        [Point(x=1.001, y=2.0), Point(x=1.002, y=2.0005), Point(x=3.0, y=-2.7)],
+        [
+            TracePoint(x=-215, y=-70, connected=False),
+            TracePoint(x=-215, y=-70, connected=True),
+            TracePoint(x=-212, y=-73, connected=True),
+            TracePoint(x=-213, y=-73, connected=True),
+            TracePoint(x=-227, y=-72, connected=True),
+            TracePoint(x=-227, y=-70, connected=True),
+            TracePoint(x=-227, y=-70, connected=True),
+            TracePoint(x=-256, y=-69, connected=False),
+            TracePoint(x=-260, y=-80, connected=True),
+        ],
+        _random_trace_points(5000),
+    ],
+)
+def test_encode_path_data(points: Sequence[Point | TracePoint]) -> None:
+    expected = Path.path_data_as_str(_points_to_svg_path(points))
+
+    x = np.array([p.x for p in points])
+    y = np.array([p.y for p in points])
+    connected = None
+    if isinstance(points[0], TracePoint):
+        x = x.astype(np.int16)
+        y = y.astype(np.int16)
+        connected = np.array([p.connected for p in points])  # type: ignore[union-attr]
+
+    path_data, last_command = _encode_path_data(x, y, connected)
+    assert path_data == expected
+    assert last_command == expected.rstrip("0123456789.- ")[-1]
+
+    # continuing on the middle point must produce the same result
+    middle = len(points) // 2
+    if middle:
+        first, command = _encode_path_data(
+            x[: middle + 1],
+            y[: middle + 1],
+            None if connected is None else connected[: middle + 1],
+        )
+        second, _ = _encode_path_data(
+            x[middle:],
+            y[middle:],
+            None if connected is None else connected[middle:],
+            previous_command=command,
+        )
+        assert first + second == expected
+
+
+def test_IncrementalTracePath() -> None:
+    """Test that the incremental path equals serializing all points at once."""
+    points = _random_trace_points(500)
+    trace_points = TracePoints(Mock())
+    trace_path = _IncrementalTracePath()
+    assert trace_path.update(trace_points) == ""
+
+    start = 0
+    for size in (1, 1, 2, 3, 50, 1, 143, 299):
+        for point in points[start : start + size]:
+            trace_points.append(point)
+        start += size
+        assert trace_path.update(trace_points) == Path.path_data_as_str(
+            _points_to_svg_path(points[:start])
+        )
+
+    # cleared points start a new path
+    trace_points.clear()
+    for point in points[:3]:
+        trace_points.append(point)
+    assert trace_path.update(trace_points) == Path.path_data_as_str(
+        _points_to_svg_path(points[:3])
+    )
+
+
 @pytest.mark.parametrize(
     ("subset", "expected"),
     [
@@ -255,7 +731,7 @@ def test_points_to_svg_path(
                 stroke_width=1.5,
                 stroke_dasharray=[4],
                 vector_effect="non-scaling-stroke",
-                d=[MoveTo(x=-78.0, y=-13.36), HorizontalLineToRel(dx=35.34)],
+                d=[_SerializedPathData("M-78.0-13.36h35.34")],
             ),
         ),
         (
@@ -284,7 +760,7 @@ def test_points_to_svg_path(
                 stroke_width=1.5,
                 stroke_dasharray=[4],
                 vector_effect="non-scaling-stroke",
-                d=[MoveTo(x=240.46, y=-39.58), LineToRel(dx=2.24, dy=173.98)],
+                d=[_SerializedPathData("M240.46-39.58l2.24 173.98")],
             ),
         ),
     ],
@@ -333,3 +809,37 @@ def test_get_svg_positions(
 ) -> None:
     result = _get_svg_positions(positions, ViewBoxFloat(view_box))
     assert result == expected
+
+
+async def test_Map_map_piece_cache(
+    execute_mock: AsyncMock, event_bus: EventBus, tmp_path: pathlib.Path
+) -> None:
+    cache = DirectoryMapPieceCache(tmp_path)
+    cached = bytes([1]) * 10000
+    fetched = bytes([2]) * 10000
+    await cache.set("map", 0, zlib.crc32(cached), cached)
+
+    map = Map(execute_mock, event_bus, map_piece_cache=cache)
+    event_bus.subscribe(MapChangedEvent, AsyncMock())
+    await block_till_done(event_bus)
+    execute_mock.reset_mock()
+
+    values = [str(MapPiece._NOT_INUSE_CRC32)] * 64
+    values[0] = str(zlib.crc32(cached))
+    values[1] = str(zlib.crc32(fetched))
+    event_bus.notify(MajorMapEvent("map", values, requested=True))
+    await block_till_done(event_bus)
+    await asyncio.gather(*map._minor_map_fetcher._tasks)
+
+    # cached piece is applied without fetching it
+    execute_mock.assert_called_once_with(GetMinorMap(map_id="map", piece_index=1))
+    assert map._map_data.map_pieces[0].crc32 == zlib.crc32(cached)
+    assert (map._map_data.map_canvas[:100, :100] == 1).all()
+
+    with patch("deebot_client.map.decompress_7z_base64_data", return_value=fetched):
+        event_bus.notify(MinorMapEvent(1, "data"))
+        await block_till_done(event_bus)
+
+    assert await cache.get("map", 1, zlib.crc32(fetched)) == fetched
+
+    await map.teardown()
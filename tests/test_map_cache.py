@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import zlib
+
+import pytest
+
+from deebot_client.map_cache import (
+    DirectoryMapPieceCache,
+    MapPieceCache,
+    SqliteMapPieceCache,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture(params=["directory", "sqlite"])
+def cache(request: pytest.FixtureRequest, tmp_path: Path) -> MapPieceCache:
+    if request.param == "directory":
+        return DirectoryMapPieceCache(tmp_path / "pieces")
+    return SqliteMapPieceCache(tmp_path / "pieces.db")
+
+
+async def test_get_set(cache: MapPieceCache) -> None:
+    data = bytes(range(100)) * 100
+    crc32 = zlib.crc32(data)
+
+    assert await cache.get("map/1", 3, crc32) is None
+    await cache.set("map/1", 3, crc32, data)
+    assert await cache.get("map/1", 3, crc32) == data
+    # other map, piece or crc32
+    assert await cache.get("map/2", 3, crc32) is None
+    assert await cache.get("map/1", 4, crc32) is None
+    assert await cache.get("map/1", 3, crc32 + 1) is None
+
+    # a newer version replaces the old one
+    new_data = bytes(10000)
+    await cache.set("map/1", 3, zlib.crc32(new_data), new_data)
+    assert await cache.get("map/1", 3, crc32) is None
+    assert await cache.get("map/1", 3, zlib.crc32(new_data)) == new_data
+
+
+async def test_get_ignores_corrupt_entry(cache: MapPieceCache) -> None:
+    await cache.set("map", 0, 1234, b"corrupt")
+    assert await cache.get("map", 0, 1234) is None
+
+
+async def test_directory_cache_os_error(tmp_path: Path) -> None:
+    file = tmp_path / "file"
+    file.write_bytes(b"")
+    cache = DirectoryMapPieceCache(file)
+
+    data = bytes(10000)
+    await cache.set("map", 0, zlib.crc32(data), data)
+    assert await cache.get("map", 0, zlib.crc32(data)) is None
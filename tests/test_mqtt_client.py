@@ -6,7 +6,7 @@ import json
 import logging
 import ssl
 from typing import TYPE_CHECKING, Any
-from unittest.mock import DEFAULT, MagicMock, Mock, patch
+from unittest.mock import DEFAULT, AsyncMock, MagicMock, Mock, patch
 
 from aiomqtt import Client, Message, MqttError as AioMqttError
 from cachetools import TTLCache
@@ -16,13 +16,26 @@ from deebot_client.commands.json.battery import GetBattery
 from deebot_client.commands.json.volume import SetVolume
 from deebot_client.const import UNDEFINED, DataType, UndefinedType
 from deebot_client.exceptions import AuthenticationError, MqttError
-from deebot_client.mqtt_client import MqttClient, MqttConfiguration, create_mqtt_config
+from deebot_client.models import ApiDeviceInfo
+from deebot_client.mqtt_client import (
+    MqttClient,
+    MqttConfiguration,
+    ReconnectPolicy,
+    SubscriberInfo,
+    _get_topics,
+    _HashRing,
+    _parse_topic,
+    _Topic,
+    _TopicKind,
+    create_mqtt_config,
+)
 
 from .mqtt_util import subscribe, verify_subscribe
 
 if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator
+
     from deebot_client.authentication import Authenticator
-    from deebot_client.models import ApiDeviceInfo
 
 
 async def test_last_message_received_at(
@@ -152,6 +165,40 @@ async def test_p2p_success(
         assert len(mqtt_client._received_p2p_commands) == 0
 
 
+async def test_execute_p2p_command_roundtrip(
+    mqtt_client: MqttClient,
+    api_device_info: ApiDeviceInfo,
+    test_mqtt_client: Client,
+) -> None:
+    """Test that a command is sent as p2p request and the response is returned."""
+    await subscribe(mqtt_client, api_device_info)
+    device_path = f"{api_device_info['did']}/{api_device_info['class']}/{api_device_info['resource']}"
+    await test_mqtt_client.subscribe(f"iot/p2p/+/+/+/+/{device_path}/q/+/j")
+    response = {"body": {"code": 0, "msg": "ok", "data": {"value": 100}}}
+
+    async def respond() -> None:
+        # Simulate the device, which responds to the request
+        async for message in test_mqtt_client.messages:
+            request = _parse_topic(message.topic.value)
+            assert request
+            await _publish_p2p(
+                request.command_name,
+                api_device_info,
+                response,
+                request.request_id,
+                test_mqtt_client,
+                is_request=False,
+            )
+            return
+
+    task = asyncio.create_task(respond())
+    assert (
+        await mqtt_client.execute_p2p_command(api_device_info, "getBattery", {})
+        == response
+    )
+    await task
+
+
 async def test_p2p_not_supported(
     mqtt_client: MqttClient,
     api_device_info: ApiDeviceInfo,
@@ -177,22 +224,12 @@ async def test_p2p_data_type_not_supported(
     mqtt_client: MqttClient, caplog: pytest.LogCaptureFixture
 ) -> None:
     """Test that unsupported command will be logged."""
-    topic_split = [
-        "iot",
-        "p2p",
-        "getBattery",
-        "test",
-        "test",
-        "test",
-        "did",
-        "get_class",
-        "resource",
-        "q",
-        "req",
-        "z",
-    ]
-
-    mqtt_client._handle_p2p(topic_split, "")
+    topic = _parse_topic(
+        "iot/p2p/getBattery/test/test/test/did/get_class/resource/q/req/z"
+    )
+    assert topic is not None
+
+    mqtt_client._handle_p2p(topic, "")
 
     assert (
         "deebot_client.mqtt_client",
@@ -324,13 +361,16 @@ async def test_mqtt_task_exceptions(
             expected_log_message,
         ) in caplog.record_tuples
 
-        assert mqtt_client._mqtt_task
-        assert mqtt_client._mqtt_task.done()
+        mqtt_task = mqtt_client._shards[0].mqtt_task
+        assert mqtt_task
+        assert mqtt_task.done()
 
         await mqtt_client.connect()
         await asyncio.sleep(0.1)
 
-        assert not mqtt_client._mqtt_task.done()
+        mqtt_task = mqtt_client._shards[0].mqtt_task
+        assert mqtt_task
+        assert not mqtt_task.done()
 
 
 @pytest.mark.parametrize(
@@ -439,3 +479,273 @@ async def test_verify_config_fails(authenticator: Authenticator) -> None:
             await client.verify_config()
 
         client_mock.return_value.__aenter__.assert_called()
+
+
+@pytest.mark.parametrize(
+    ("topic", "expected"),
+    [
+        (
+            "iot/atr/onBattery/did/class/res/j",
+            _Topic(
+                "iot/atr/onBattery/did/class/res/j",
+                _TopicKind.ATR,
+                "onBattery",
+                "did",
+                DataType.JSON,
+                "j",
+            ),
+        ),
+        (
+            "iot/p2p/setVolume/did/class/res/sender/class/res/p/req/X",
+            _Topic(
+                "iot/p2p/setVolume/did/class/res/sender/class/res/p/req/X",
+                _TopicKind.P2P,
+                "setVolume",
+                "did",
+                DataType.XML,
+                "X",
+                is_request=False,
+                request_id="req",
+            ),
+        ),
+        (
+            "iot/p2p/setVolume/did/class/res/sender/class/res/q/req/z",
+            _Topic(
+                "iot/p2p/setVolume/did/class/res/sender/class/res/q/req/z",
+                _TopicKind.P2P,
+                "setVolume",
+                "did",
+                None,
+                "z",
+                is_request=True,
+                request_id="req",
+            ),
+        ),
+        ("iot/p2p/setVolume/did/class/res/j", None),
+        ("iot/cfg/onBattery/did/class/res/j", None),
+        ("test/atr/onBattery/did/class/res/j", None),
+        ("iot/atr", None),
+    ],
+)
+def test_parse_topic(topic: str, expected: _Topic | None) -> None:
+    assert _parse_topic(topic) == expected
+
+
+async def test_topic_cache(
+    authenticator: Authenticator, api_device_info: ApiDeviceInfo
+) -> None:
+    """Test that only atr topics of subscribed devices are cached."""
+    client = MqttClient(
+        create_mqtt_config(device_id="123", country="IT"), authenticator
+    )
+    did = api_device_info["did"]
+    atr_topic = f"iot/atr/onBattery/{did}/class/res/j"
+    assert client._get_topic(atr_topic)
+    assert not client._atr_topics
+
+    info = SubscriberInfo(api_device_info, Mock(), Mock())
+    client._subscriptions[did] = info
+    for request_id in range(10):
+        client._get_topic(
+            f"iot/p2p/setVolume/{did}/class/res/sender/class/res/p/{request_id}/j"
+        )
+    assert not client._atr_topics
+
+    topic = client._get_topic(atr_topic)
+    assert client._get_topic(atr_topic) is topic
+    assert client._atr_topics == {atr_topic: topic}
+
+    # unsubscribing the device drops its cached topics
+    shard = client._shards[0]
+    shard.subscription_changes.put_nowait((info, False))
+    task = asyncio.create_task(
+        client._pending_subscriptions_worker(AsyncMock(spec=Client), shard)
+    )
+    await shard.subscription_changes.join()
+    task.cancel()
+    assert not client._atr_topics
+
+
+async def test_subscription_changes_batched(authenticator: Authenticator) -> None:
+    """Test that queued subscription changes are sent as batched packets."""
+    client = MqttClient(
+        create_mqtt_config(device_id="123", country="IT"), authenticator
+    )
+    aiomqtt_client = AsyncMock(spec=Client)
+
+    def get_info(did: str) -> SubscriberInfo:
+        device_info = ApiDeviceInfo(
+            {
+                "company": "company",
+                "did": did,
+                "name": "name",
+                "nick": "nick",
+                "resource": "resource",
+                "class": "get_class",
+            }
+        )
+        return SubscriberInfo(device_info, Mock(), Mock())
+
+    info_1, info_2, info_3 = get_info("did1"), get_info("did2"), get_info("did3")
+    client._subscriptions["did3"] = info_3
+    shard = client._shards[0]
+    for change in ((info_1, True), (info_2, True), (info_1, False), (info_3, False)):
+        shard.subscription_changes.put_nowait(change)
+
+    task = asyncio.create_task(
+        client._pending_subscriptions_worker(aiomqtt_client, shard)
+    )
+    await shard.subscription_changes.join()
+    task.cancel()
+
+    aiomqtt_client.subscribe.assert_awaited_once_with(
+        [(topic, 0) for topic in _get_topics(info_2.device_info)]
+    )
+    aiomqtt_client.unsubscribe.assert_awaited_once_with(_get_topics(info_3.device_info))
+    assert client._subscriptions == {"did2": info_2}
+
+
+def test_config_shards_invalid() -> None:
+    with pytest.raises(MqttError, match="At least one shard is required"):
+        create_mqtt_config(device_id="123", country="IT", shards=0)
+
+
+async def test_shards(authenticator: Authenticator) -> None:
+    """Test that devices are spread consistently across shard connections."""
+    client = MqttClient(
+        create_mqtt_config(device_id="123", country="IT", shards=4), authenticator
+    )
+    dids = [f"did{i}" for i in range(1000)]
+    shards = {did: client._get_shard(did).index for did in dids}
+    assert set(shards.values()) == {0, 1, 2, 3}
+    assert shards == {did: client._get_shard(did).index for did in dids}
+
+    # Adding a shard should only move devices to the new shard
+    ring = _HashRing(5)
+    moved = [did for did in dids if ring.get_shard(did) != shards[did]]
+    assert all(ring.get_shard(did) == 4 for did in moved)
+    assert len(moved) < len(dids) / 3
+
+    with patch("deebot_client.mqtt_client.Client", autospec=True) as client_mock:
+        await client._get_client(0)
+        await client._get_client(2)
+    identifiers = [call.kwargs["identifier"] for call in client_mock.call_args_list]
+    assert identifiers[0].endswith("@ecouser/123")
+    assert identifiers[1].endswith("@ecouser/123_2")
+
+
+def test_reconnect_policy() -> None:
+    policy = ReconnectPolicy(base_delay=1, multiplier=2, max_delay=10)
+    assert policy.get_delay(0) == 0
+    for attempt, upper_bound in ((1, 1), (2, 2), (3, 4), (4, 8), (5, 10), (10_000, 10)):
+        for _ in range(20):
+            assert 0 <= policy.get_delay(attempt) <= upper_bound
+
+    with patch("deebot_client.mqtt_client.random.uniform") as uniform:
+        policy.get_delay(3)
+    uniform.assert_called_once_with(0, 4)
+
+
+async def test_reconnect_stats(authenticator: Authenticator) -> None:
+    """Test that connection failures are retried with backoff and tracked."""
+    connected = asyncio.Event()
+    aiomqtt_client = AsyncMock(spec=Client)
+
+    async def messages() -> AsyncGenerator[Message]:
+        connected.set()
+        await asyncio.Event().wait()
+        yield Mock()
+
+    aiomqtt_client.messages = messages()
+    client = MqttClient(
+        create_mqtt_config(
+            device_id="123",
+            country="IT",
+            reconnect_policy=ReconnectPolicy(base_delay=0.01),
+        ),
+        authenticator,
+    )
+    with patch("deebot_client.mqtt_client.Client") as client_mock:
+        client_mock.return_value.__aenter__.side_effect = [
+            AioMqttError("Error"),
+            AioMqttError("Error"),
+            aiomqtt_client,
+        ]
+        await client.connect()
+        await asyncio.wait_for(connected.wait(), 1)
+
+        (stats,) = client.reconnect_stats
+        assert stats.connects == 1
+        assert stats.failures == 2
+        assert stats.consecutive_failures == 0
+        assert 0 < stats.last_delay <= 0.01
+        assert stats.last_connected_at is not None
+        assert stats.last_disconnected_at is None
+        await client.disconnect()
+
+
+async def test_execute_p2p_command(
+    authenticator: Authenticator, api_device_info: ApiDeviceInfo
+) -> None:
+    """Test that p2p responses are correlated to the request by the request id."""
+    device_path = f"{api_device_info['did']}/{api_device_info['class']}/{api_device_info['resource']}"
+    client = MqttClient(
+        create_mqtt_config(device_id="123", country="IT"), authenticator
+    )
+    with pytest.raises(MqttError, match="Not connected"):
+        await client.execute_p2p_command(api_device_info, "getBattery", {})
+
+    aiomqtt_client = AsyncMock(spec=Client)
+    client._shards[0].client = aiomqtt_client
+    with pytest.raises(MqttError, match="Device not subscribed"):
+        await client.execute_p2p_command(api_device_info, "getBattery", {})
+    aiomqtt_client.publish.assert_not_called()
+
+    client._subscriptions[api_device_info["did"]] = SubscriberInfo(
+        api_device_info, Mock(), Mock()
+    )
+    task = asyncio.create_task(
+        client.execute_p2p_command(api_device_info, "getBattery", {"body": {}})
+    )
+    await asyncio.sleep(0.1)
+
+    aiomqtt_client.publish.assert_awaited_once()
+    topic, payload = aiomqtt_client.publish.call_args.args
+    assert json.loads(payload) == {"body": {}}
+    request = _parse_topic(topic)
+    assert request
+    assert request.is_request
+    assert topic == (
+        f"iot/p2p/getBattery/user_id/ecouser/123/{device_path}/q/{request.request_id}/j"
+    )
+
+    # Own request is ignored
+    client._handle_p2p(request, payload)
+    assert not task.done()
+    assert len(client._received_p2p_commands) == 0
+
+    response = _parse_topic(
+        f"iot/p2p/getBattery/{device_path}/user_id/ecouser/123/p/{request.request_id}/j"
+    )
+    assert response
+    client._handle_p2p(response, json.dumps({"body": {"data": {"value": 100}}}))
+
+    assert await task == {"body": {"data": {"value": 100}}}
+    assert not client._p2p_requests
+
+
+async def test_execute_p2p_command_timeout(
+    authenticator: Authenticator, api_device_info: ApiDeviceInfo
+) -> None:
+    client = MqttClient(
+        create_mqtt_config(device_id="123", country="IT", p2p_command_timeout=0.1),
+        authenticator,
+    )
+    client._shards[0].client = AsyncMock(spec=Client)
+    client._subscriptions[api_device_info["did"]] = SubscriberInfo(
+        api_device_info, Mock(), Mock()
+    )
+
+    with pytest.raises(TimeoutError):
+        await client.execute_p2p_command(api_device_info, "getBattery", {})
+    assert not client._p2p_requests
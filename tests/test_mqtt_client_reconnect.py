@@ -53,7 +53,7 @@ async def test_client_reconnect_on_broker_error(
     assert (
         "deebot_client.mqtt_client",
         logging.WARNING,
-        "Connection lost; Reconnecting in 5 seconds ...",
+        "Connection lost; Reconnecting in 0.0 seconds ...",
     ) in caplog.record_tuples
     caplog.clear()
 
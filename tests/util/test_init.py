@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import asyncio
 from typing import Any
+from unittest.mock import Mock
 
-from deebot_client.util import cancel, create_task
+from deebot_client.util import OnChangedDict, OnChangedList, cancel, create_task
 
 
 async def test_create_task_and_cancel() -> None:
@@ -35,3 +36,69 @@ async def test_create_task_and_cancel() -> None:
     for task in _tasks:
         assert task.cancelled()
         assert task.done()
+
+
+def test_on_changed_list() -> None:
+    on_change = Mock()
+    values = OnChangedList(on_change, [1, 2], ignore_equal=True)
+
+    # reads don't trigger on_change
+    assert len(values) == 2
+    assert list(values) == [1, 2]
+    assert values[0] == 1
+    assert values.append is not None
+    on_change.assert_not_called()
+
+    values[0] = 1
+    values.extend([])
+    on_change.assert_not_called()
+    assert values.version == 0
+
+    values.append(3)
+    values[0] = 0
+    values += [4]
+    del values[-1]
+    assert values.pop() == 3
+    values.remove(2)
+    assert values == [0]
+    assert on_change.call_count == values.version == 6
+
+    values.clear()
+    values.clear()
+    assert on_change.call_count == values.version == 7
+
+
+def test_on_changed_dict() -> None:
+    on_change = Mock()
+    values = OnChangedDict(on_change, [(1, "a")], ignore_equal=True)
+
+    assert values[1] == "a"
+    assert values.get(2) is None
+    assert values.pop is not None
+    values[1] = "a"
+    values.update({1: "a"})
+    assert values.pop(2, None) is None
+    assert values.setdefault(1, "b") == "a"
+    on_change.assert_not_called()
+
+    values[1] = "b"
+    values.update([(2, "c"), (5, "x")])
+    values |= {3: "d"}
+    del values[3]
+    assert values.pop(2) == "c"
+    assert values.popitem() == (5, "x")
+    values.setdefault(4, "e")
+    assert values == {1: "b", 4: "e"}
+    assert on_change.call_count == values.version == 7
+
+    values.clear()
+    values.clear()
+    assert on_change.call_count == values.version == 8
+
+
+def test_on_changed_dict_equal_writes() -> None:
+    on_change = Mock()
+    values: OnChangedDict[int, str] = OnChangedDict(on_change, [(1, "a")])
+
+    values[1] = "a"
+    on_change.assert_called_once()